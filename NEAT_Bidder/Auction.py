@@ -0,0 +1,101 @@
+import numpy as np
+"""The auction of one game, shared by the GameState and its four BidBots.
+
+Players and bids are integers: players index ['N', 'E', 'S', 'W'] and bids index all_bids, which is
+also the order of the network outputs. The current contract, its bidder, the double state and the
+number of passes in a row are updated as bids are added, so the legal bids are a table lookup.
+"""
+
+players = ['N', 'E', 'S', 'W']
+all_bids = ['PASS', 'X', 'XX', '1C', '1D', '1H', '1S', '1NT', '2C', '2D', '2H', '2S', '2NT', '3C', '3D', '3H', '3S', '3NT', '4C', '4D', '4H', '4S', '4NT', '5C', '5D', '5H', '5S', '5NT', '6C', '6D', '6H', '6S', '6NT', '7C', '7D', '7H', '7S', '7NT']
+bid_to_int = {bid: i for i, bid in enumerate(all_bids)}
+doubles = ['N', 'X', 'XX']
+
+PASS = 0
+DOUBLE = 1
+REDOUBLE = 2
+NUM_BIDS = len(all_bids)
+
+
+# legal_table[contract + 1][opponents][doubled] is the boolean array of legal bids, where
+# contract is the last contract bid (-1 for none), opponents whether it was made by the other side
+# and doubled the double state of the contract
+def build_legal_table():
+    table = np.zeros((NUM_BIDS + 1, 2, len(doubles), NUM_BIDS), dtype=bool)
+
+    for contract in range(-1, NUM_BIDS):
+        for opponents in [False, True]:
+            for doubled in range(len(doubles)):
+                legal = table[contract + 1, int(opponents), doubled]
+                legal[PASS] = True
+                legal[max(contract + 1, REDOUBLE + 1):] = True
+
+                if contract > REDOUBLE:
+                    legal[DOUBLE] = opponents and doubled == 0
+                    legal[REDOUBLE] = not opponents and doubled == 1
+
+    # masks are shared, nobody should change them
+    table.flags.writeable = False
+    return table
+
+
+legal_table = build_legal_table()
+
+
+class Auction:
+
+    __slots__ = ('bids', 'contract', 'declarer', 'doubled', 'passes')
+
+    def __init__(self):
+        # (player, bid) pairs in the order they were made
+        self.bids = []
+        self.reset()
+
+    # start a new auction, keeping the list of bids
+    def reset(self):
+        self.bids.clear()
+
+        # last contract bid and the player who made it, -1 while there is none
+        self.contract = -1
+        self.declarer = -1
+
+        # index into doubles, and passes in a row at the end of the auction
+        self.doubled = 0
+        self.passes = 0
+
+    def add_bid(self, player, bid):
+        self.bids.append((player, bid))
+
+        if bid == PASS:
+            self.passes += 1
+            return
+
+        self.passes = 0
+        if bid == DOUBLE:
+            self.doubled = 1
+        elif bid == REDOUBLE:
+            self.doubled = 2
+        else:
+            self.contract = bid
+            self.declarer = player
+            self.doubled = 0
+
+    # 3 passes in a row ends the auction, 4 if nobody has bid yet
+    def is_finished(self):
+        return len(self.bids) > 3 and self.passes >= 3
+
+    # boolean array of the bids player may make now, indexed like all_bids
+    def legal_bids(self, player):
+        opponents = self.contract >= 0 and (player - self.declarer) % 2 == 1
+        return legal_table[self.contract + 1, int(opponents), self.doubled]
+
+    # the player, contract and double state of the final contract as strings
+    # a passed out auction gives the last player to pass and 'PASS'
+    def get_last_bid(self):
+        if self.contract < 0:
+            return players[self.bids[-1][0]], 'PASS', 'N'
+        return players[self.declarer], all_bids[self.contract], doubles[self.doubled]
+
+    # string form of the bids, for display
+    def get_previous_bids(self):
+        return [[players[player], all_bids[bid]] for player, bid in self.bids]
@@ -0,0 +1,158 @@
+import numpy as np
+from Auction import legal_table, players, PASS, DOUBLE, REDOUBLE
+from BidBot import BidBot
+from DSS_adapter import return_best_contract, store_results
+from GameState import GameState
+from NumpyNetwork import network_cache
+from Scoring import score_contracts, imps
+from Timing import timed
+"""Many auctions between one genome pair played in lockstep.
+
+Every game of a deal pool is bid at the same time. At each step the games where a N/S player is to
+bid go through genome1's net in one batch, and the games where an E/W player is to bid go through
+genome2's net, so a step is two forward passes and a few array operations however many games are
+played. The bots see the same input and choose the same bids as the BidBots of a GameState, so the
+scores are the same as playing the games one by one.
+
+The best contract of a deal doesn't depend on the genomes, so its score is worked out once per deal
+pool with best_scores, and handed to every BatchedAuction playing the pool.
+"""
+
+# the bids after XX in all_bids go 1C, 1D, 1H, 1S, 1NT, 2C..., these are their indices in Scoring.strains
+bid_strains = np.array([3, 2, 1, 0, 4])
+
+
+# N/S score of the best contract of every deal of a pool, which calculate_scores compares the played ones to
+@timed('best_scores')
+def best_scores(deal_pool):
+    ns_best = np.zeros(len(deal_pool))
+    for i, (deal, vulnerable, dealer, table) in enumerate(deal_pool):
+        store_results(deal, table)
+        best_team, best_contract, best_score = return_best_contract(deal, vulnerable, dealer, GameState.best_contract_mode)
+        ns_best[i] = best_score if best_team == ['N', 'S'] else -best_score
+    return ns_best
+
+
+class BatchedAuction:
+
+    # ns_best is best_scores of the deal pool, worked out here if it isn't given
+    def __init__(self, genome1, genome2, config, deal_pool, ns_best=None):
+        self.deal_pool = deal_pool
+        self.ns_best = ns_best
+        size = len(deal_pool)
+
+        # N, S bots get Genome1, E, W bots get Genome2, indexed by seat % 2
+        self.nets = [network_cache.get(genome1, config), network_cache.get(genome2, config)]
+
+        deals = np.array([deal for deal, vulnerable, dealer, table in deal_pool])
+        self.tables = np.array([table for deal, vulnerable, dealer, table in deal_pool])
+
+        # vulnerability of each seat of each game
+        self.vulnerable = np.array([[vulnerable == 'BOTH' or player in vulnerable for player in players]
+                                    for deal, vulnerable, dealer, table in deal_pool])
+
+        # one input buffer per seat per game, laid out like BidBot.inputs
+        self.inputs = np.full((size, len(players), BidBot.input_size), -1.0)
+        self.inputs[:, :, 0] = self.vulnerable
+        self.inputs[:, :, 1:BidBot.bids_start:2] = 12 - deals % 13
+        self.inputs[:, :, 2:BidBot.bids_start:2] = 3 - deals // 13
+
+        # the state of each auction, like Auction but one entry per game
+        self.next_player = np.array([dealer for deal, vulnerable, dealer, table in deal_pool])
+        self.contract = np.full(size, -1)
+        self.declarer = np.full(size, -1)
+        self.doubled = np.zeros(size, dtype=int)
+        self.passes = np.zeros(size, dtype=int)
+        self.bid_count = np.zeros(size, dtype=int)
+        self.finished = np.zeros(size, dtype=bool)
+
+    def is_finished(self):
+        return self.finished.all()
+
+    # boolean arrays of the legal bids for the given players in the given games
+    @timed('legal_bids')
+    def legal_bids(self, games, seats):
+        declarer = self.declarer[games]
+        opponents = (declarer >= 0) & ((seats - declarer) % 2 == 1)
+        return legal_table[self.contract[games] + 1, opponents.astype(int), self.doubled[games]]
+
+    # every game that isn't finished gets one more bid
+    @timed('bidding')
+    def step(self):
+        games = np.flatnonzero(~self.finished)
+        seats = self.next_player[games]
+        bids = np.zeros(len(games), dtype=int)
+
+        for team, net in enumerate(self.nets):
+            rows = seats % 2 == team
+            if not rows.any():
+                continue
+
+            outputs = net.activate_batch(self.inputs[games[rows], seats[rows]])
+            legal = self.legal_bids(games[rows], seats[rows])
+
+            # select bid with highest priority, the first one if several are equal
+            bids[rows] = np.argmax(np.where(legal, outputs, -np.inf), axis=1)
+
+        self.add_bids(games, seats, bids)
+
+    def add_bids(self, games, seats, bids):
+
+        # write the bids into the inputs of every seat, bids past the end of the buffer are left out
+        count = self.bid_count[games]
+        visible = count < BidBot.max_encoded_bids
+        slots = BidBot.bids_start + 2 * count[visible]
+        self.inputs[games[visible], :, slots] = seats[visible, np.newaxis]
+        self.inputs[games[visible], :, slots + 1] = bids[visible, np.newaxis]
+
+        self.passes[games] = np.where(bids == PASS, self.passes[games] + 1, 0)
+        self.doubled[games[bids == DOUBLE]] = 1
+        self.doubled[games[bids == REDOUBLE]] = 2
+
+        contract = bids > REDOUBLE
+        self.contract[games[contract]] = bids[contract]
+        self.declarer[games[contract]] = seats[contract]
+        self.doubled[games[contract]] = 0
+
+        self.bid_count[games] += 1
+        self.next_player[games] = (seats + 1) % 4
+
+        # 3 passes in a row ends the game
+        self.finished[games] = (self.bid_count[games] > 3) & (self.passes[games] >= 3)
+
+    def play(self):
+        while not self.is_finished():
+            self.step()
+
+    # N/S score of the played contract of every game, as GameState.ns_score
+    def ns_scores(self):
+        games = np.arange(len(self.deal_pool))
+        played = self.contract >= 0
+
+        # score the played contracts for the declarer, passed out games score 0
+        bids = np.maximum(self.contract, REDOUBLE + 1) - (REDOUBLE + 1)
+        strains = bid_strains[bids % 5]
+        declarer = np.maximum(self.declarer, 0)
+        tricks = self.tables[games, strains, declarer]
+        declarer_scores = score_contracts(bids // 5 + 1, strains, self.doubled, self.vulnerable[games, declarer], tricks)
+        declarer_scores = np.where(played, declarer_scores, 0)
+        return np.where(declarer % 2 == 0, declarer_scores, -declarer_scores)
+
+    # difference from the best score for every seat of every game, as GameState.calculate_scores
+    @timed('scoring')
+    def calculate_scores(self):
+        # N/S score of the played contract and of the best contract
+        ns_scores = self.ns_scores()
+        if self.ns_best is None:
+            self.ns_best = best_scores(self.deal_pool)
+
+        # total difference from best score, which is the same for all four seats
+        diff = -1 * np.abs(self.ns_best - ns_scores)
+        return np.repeat(diff[:, np.newaxis], len(players), axis=1)
+
+    # IMPs of every seat against the other table of duplicate boards, as GameState.duplicate_scores
+    # replay is the finished BatchedAuction of the same deal pool with the genomes swapped
+    @timed('scoring')
+    def duplicate_scores(self, replay):
+        genome1_imps = imps(self.ns_scores() - replay.ns_scores())
+        return np.stack([genome1_imps, -genome1_imps, genome1_imps, -genome1_imps], axis=1)
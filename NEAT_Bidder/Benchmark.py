@@ -0,0 +1,267 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import sys
+import time
+import neat
+import numpy as np
+import DSS_adapter
+from DSS_adapter import convert_initial_to_DDS_format, getFullResults, solve_deals, store_results
+from Deal import random_deal
+from GameState import GameState
+from PBNReader import read_deal_list
+import NEAT_bidder
+"""Speed benchmarks for every stage of training, from dealing cards to a full generation.
+
+Each stage reports its throughput, and the results can be written as JSON. Rates depend on the
+machine and its load, so every stage is also stored relative to a fixed reference kernel timed in the
+same run. With --baseline the relative rates are compared against a stored baseline, and any stage
+slower than the baseline by more than the tolerance fails the run.
+Deals come from the DDS test files in dds/hands, and are solved by the bundled libdds.so, so the
+benchmark runs offline:
+
+    python3 Benchmark.py --output bench.json
+    python3 Benchmark.py --baseline
+    python3 Benchmark.py --save-baseline
+    python3 NEAT_bidder.py benchmark --population 10
+"""
+
+here = os.path.dirname(os.path.abspath(__file__))
+baseline_path = os.path.join(here, "benchmark_baseline.json")
+default_deals = os.path.join(here, "dds", "hands", "list100.txt")
+
+
+# runs function over the items, returns seconds taken and the results
+# with repeat the fastest of that many runs is taken, the slower ones were slowed down by other load
+def timed(function, items, repeat=1):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = [function(item) for item in items]
+        seconds = time.perf_counter() - start
+        if best is None or seconds < best:
+            best = seconds
+    return best, results
+
+# repeats of the cheap stages
+cheap_repeat = 3
+
+
+def result(seconds, count, unit):
+    return {'seconds': seconds, 'count': count, 'rate': count / seconds, 'unit': unit}
+
+
+def new_genomes(config, count):
+    genomes = []
+    for key in range(count):
+        genome = config.genome_type(key)
+        genome.configure_new(config.genome_config)
+        genomes.append(genome)
+    return genomes
+
+
+# ------------------------------------------------------------------
+# Stages
+
+# a fixed mix of Python and small numpy work, like the bidding, that the other stages are measured against
+def bench_reference(count):
+    cards = np.arange(52)
+
+    def work(i):
+        total = 0
+        for card in range(52):
+            total += (i * card) % 13
+        return total + int(np.argmax(cards % (i % 13 + 1)))
+
+    seconds, totals = timed(work, range(count), cheap_repeat)
+    return result(seconds, count, 'runs/s')
+
+
+def bench_random_deal(count):
+    rng = np.random.default_rng(0)
+    seconds, deals = timed(lambda _: random_deal(rng), range(count), cheap_repeat)
+    return result(seconds, count, 'deals/s')
+
+
+def bench_convert(deal_list, count):
+    deals = [deal_list[i % len(deal_list)][0] for i in range(count)]
+    seconds, converted = timed(convert_initial_to_DDS_format, deals, cheap_repeat)
+    return result(seconds, count, 'deals/s')
+
+
+# one CalcDDtable call per deal, the cache is cleared so every deal is solved
+def bench_calc_dd_table(deal_list):
+
+    def solve(record):
+        DSS_adapter.clear_cache()
+        return getFullResults(record[0])
+
+    seconds, tables = timed(solve, deal_list)
+    bench = result(seconds, len(deal_list), 'tables/s')
+    bench['mismatches'] = sum(not np.array_equal(table, record[3]) for table, record in zip(tables, deal_list))
+    return bench
+
+
+# all deals at once through CalcAllTables
+def bench_calc_all_tables(deal_list):
+    DSS_adapter.clear_cache()
+    start = time.perf_counter()
+    tables = solve_deals([record[0] for record in deal_list])
+    bench = result(time.perf_counter() - start, len(deal_list), 'tables/s')
+    bench['mismatches'] = sum(not np.array_equal(table, record[3]) for table, record in zip(tables, deal_list))
+    return bench
+
+
+# the first bid of the deals, choose_bid doesn't change the game so it can be asked again
+def bench_choose_bid(deal_list, genomes, config, count):
+    games = [GameState(*genomes, config, deal, vulnerable, dealer) for deal, vulnerable, dealer, table in deal_list]
+    games = [games[i % len(games)] for i in range(count)]
+    seconds, bids = timed(lambda game: game.bots[game.next_player].choose_bid(), games, cheap_repeat)
+    return result(seconds, count, 'bids/s')
+
+
+# whole auctions and their scores, the tables are in the cache so nothing is solved
+# one game is reset for every deal, as a loop playing many games would
+def bench_game(deal_list, genomes, config, count):
+    deal_list = [deal_list[i % len(deal_list)] for i in range(count)]
+    game = GameState(*genomes, config, *deal_list[0][:3])
+
+    def play(record):
+        deal, vulnerable, dealer, table = record
+        store_results(deal, table)
+        game.reset(deal, vulnerable, dealer)
+        while game.bidding_is_finished() == False:
+            game.add_bid()
+        return game.calculate_scores()
+
+    seconds, scores = timed(play, deal_list, cheap_repeat)
+    return result(seconds, count, 'games/s')
+
+
+# one generation of eval_genomes for a population of the given size, dealing and solving included
+def bench_generation(config, population_size):
+    config.pop_size = population_size
+    population = neat.Population(config)
+    genomes = list(population.population.items())
+
+    start = time.perf_counter()
+    # eval_genomes prints a line per pair
+    with contextlib.redirect_stdout(io.StringIO()):
+        NEAT_bidder.eval_genomes(genomes, config)
+    seconds = time.perf_counter() - start
+
+    return result(seconds, len(genomes) // 2 * NEAT_bidder.trials, 'games/s')
+
+
+def run_benchmarks(deal_path, populations, count, config_path=NEAT_bidder.default_config_path):
+    random.seed(0)
+    NEAT_bidder.eval_rng = np.random.default_rng(0)
+    config = NEAT_bidder.load_config(config_path)
+    deal_list = read_deal_list(deal_path)
+    genomes = new_genomes(config, 2)
+
+    # timed before and after the stages, so a change of load during the run counts half
+    reference = bench_reference(count)
+
+    results = {
+        'random_deal': bench_random_deal(count),
+        'convert_initial_to_DDS_format': bench_convert(deal_list, count),
+        'CalcDDtable': bench_calc_dd_table(deal_list),
+        'CalcAllTables': bench_calc_all_tables(deal_list),
+        'choose_bid': bench_choose_bid(deal_list, genomes, config, count),
+        'game': bench_game(deal_list, genomes, config, count // 10),
+    }
+    for population_size in populations:
+        results[f'generation_{population_size}'] = bench_generation(config, population_size)
+
+    after = bench_reference(count)
+    reference['rate'] = (reference['rate'] + after['rate']) / 2
+    for bench in results.values():
+        bench['relative'] = bench['rate'] / reference['rate']
+    results['reference'] = reference
+
+    return {
+        # relative to this file, so a baseline doesn't depend on where it was recorded
+        'deals': os.path.relpath(deal_path, here),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'results': results,
+    }
+
+
+# stages of the baseline that are slower now by more than tolerance, as a fraction of the baseline
+# the rates relative to the reference are compared, so a baseline from another machine can be used
+def find_regressions(current, baseline, tolerance):
+    regressions = []
+    for stage, expected in baseline['results'].items():
+        if stage not in current['results'] or 'relative' not in expected:
+            continue
+        relative = current['results'][stage]['relative']
+        if relative < expected['relative'] * (1 - tolerance):
+            regressions.append(f"{stage}: {relative:.4g} of the reference, baseline {expected['relative']:.4g}")
+    return regressions
+
+
+def print_results(report):
+    for stage, bench in report['results'].items():
+        line = f"{stage:32} {bench['rate']:12.1f} {bench['unit']:9} ({bench['count']} in {bench['seconds']:.3f}s)"
+        if 'relative' in bench:
+            line += f"  {bench['relative']:.4g} of reference"
+        if bench.get('mismatches'):
+            line += f"  {bench['mismatches']} tables differ from the file"
+        print(line)
+
+
+# returns the exit status, 1 if a stage is slower than the baseline allows or gives wrong results
+# the baseline is only compared against with --baseline
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the stages of training")
+    parser.add_argument('--deals', default=default_deals, help="DDS test file with the deals to use")
+    parser.add_argument('--population', type=int, nargs='*', default=[10, 50], help="population sizes for a full generation")
+    parser.add_argument('--count', type=int, default=10000, help="repetitions of the cheap stages")
+    parser.add_argument('--output', help="write the results as JSON to this file")
+    parser.add_argument('--baseline', nargs='?', const=baseline_path,
+                        help=f"compare against the baseline in this file, {os.path.basename(baseline_path)} if none is given")
+    parser.add_argument('--save-baseline', action='store_true', help="store the results as the new baseline")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="allowed slowdown against the baseline")
+    parser.add_argument('--config', default=NEAT_bidder.default_config_path, help="NEAT configuration file")
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(args.deals, args.population, args.count, args.config)
+    print_results(report)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    # the solver has to agree with the tables in the test file
+    failed = [stage for stage, bench in report['results'].items() if bench.get('mismatches')]
+    for stage in failed:
+        print(f"WRONG RESULTS {stage}")
+
+    regressions = []
+    if args.save_baseline:
+        path = args.baseline or baseline_path
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"baseline saved to {path}")
+    elif args.baseline:
+        try:
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+            regressions = find_regressions(report, baseline, args.tolerance)
+        except FileNotFoundError:
+            print(f"no baseline at {args.baseline}, nothing to compare against")
+
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions or failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,48 +1,83 @@
 import random
-import neat
+import numpy as np
+from NumpyNetwork import network_cache
 from DSS_adapter import getExpectedTricks
 from Scoring import get_score_from_result
-from Deal import bid_options as master_options
+from Auction import all_bids
+from Timing import timed
 
 class BidBot:
 
+    # a bot is reset for every game instead of being made again, see reset
+    __slots__ = ('name', 'seat', 'my_team', 'auction', 'game_vulnerability', 'vulnerability', 'hand',
+                 'valid', 'priorities', 'inputs', 'encoded_bids', 'genome', 'net')
+
     # variables for encoding input layer
-    all_bids = ['PASS', 'X', 'XX', '1C', '1D', '1H', '1S', '1NT', '2C', '2D', '2H', '2S', '2NT', '3C', '3D', '3H', '3S', '3NT', '4C', '4D', '4H', '4S', '4NT', '5C', '5D', '5H', '5S', '5NT', '6C', '6D', '6H', '6S', '6NT', '7C', '7D', '7H', '7S', '7NT']
+    all_bids = all_bids
     ranks = ['2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A']
     suits = ['C', 'D', 'H', 'S']
     players = ['N', 'E', 'S', 'W']
-    rank_to_int = {rank: i for i, rank in enumerate(ranks)}
-    suit_to_int = {suit: i for i, suit in enumerate(suits)}
-    bid_to_int = {bid: i for i, bid in enumerate(all_bids)}
     player_to_int = {player: i for i, player in enumerate(players)}
+    teams = {'N': ['N','S'], 'S': ['N','S'], 'E': ['E','W'], 'W': ['E','W']}
+    # every bid is valid before the bot is first asked for one
+    all_valid = np.ones(len(all_bids), dtype=bool)
+    all_valid.flags.writeable = False
+
+    # layout of the input buffer: vulnerability, 13 cards of 2 values, then 2 values per bid
+    input_size = 200
+    bids_start = 27
+    max_encoded_bids = (input_size - bids_start) // 2
     # -------------------------------------------------------------
 
-    def __init__(self, name, game_vulnerability, hand, genome, config):
+    def __init__(self, name, game_vulnerability, hand, genome, config, auction):
 
-        # Bot details
+        # Bot details, the seat stays the same for every game
         self.name = name
+        self.seat = self.player_to_int[name]
+        self.my_team = self.teams[name]
+
+        # game state, the auction is shared with the GameState and the other bots
+        self.auction = auction
+
+        # valid flags and priorities of the bids, indexed like all_bids, see possible_bids
+        self.valid = self.all_valid
+        self.priorities = np.ones(len(self.all_bids))
+
+        # input buffer for the net
+        self.inputs = np.empty(self.input_size)
+
+        self.reset(game_vulnerability, hand, genome, config)
+
+    # set the bot up for a new game, reusing its buffers
+    def reset(self, game_vulnerability, hand, genome, config):
         self.game_vulnerability = game_vulnerability
 
         if game_vulnerability == 'BOTH':
             self.vulnerability = True
         else: 
-            self.vulnerability = name in game_vulnerability
-        if self.name in ['N','S']:
-            self.my_team = ['N','S']
-        else:
-            self.my_team = ['E','W']
+            self.vulnerability = self.name in game_vulnerability
         self.hand = hand
 
-        # game state
-        self.previous_bids = []
+        self.valid = self.all_valid
+        self.priorities.fill(1.0)
 
-        # bid has form {bid: {valid: , priority:}}
-        self.possible_bids  = {bid: {'valid': True, 'priority': 1} for bid in self.all_bids}
+        # the vulnerability and hand never change during a game so they are encoded once, like encode_card
+        self.inputs.fill(-1.0)
+        self.inputs[0] = int(self.vulnerability)
+        self.inputs[1:self.bids_start:2] = 12 - hand % 13
+        self.inputs[2:self.bids_start:2] = 3 - hand // 13
+        self.encoded_bids = 0
 
         # Bidding NN 
         self.genome = genome
-        self.net = neat.nn.FeedForwardNetwork.create(self.genome, config)
-        genome.fitness = 0.0
+        # compiled once per generation, and shared by every bot playing this genome
+        self.net = network_cache.get(self.genome, config)
+
+    # bid has form {bid: {valid: , priority:}}, made from the arrays when it is asked for
+    @property
+    def possible_bids(self):
+        return {bid: {'valid': bool(valid), 'priority': priority}
+                for bid, valid, priority in zip(self.all_bids, self.valid, self.priorities)}
         
     # returns my score based on the final contract 
     def get_score(self, deal):
@@ -82,13 +117,15 @@ class BidBot:
     
 
 
-    
-    # adds a bid from another bot
-    def update_previous_bids(self, bid):
-        self.previous_bids.append(bid)
-    
-    
-        
+
+    # writes a new bid of the auction into its slot of the input buffer
+    # bids past the end of the buffer can't be seen by the net, they are left out
+    def update_previous_bids(self, player, bid):
+        if self.encoded_bids < self.max_encoded_bids:
+            slot = self.bids_start + 2 * self.encoded_bids
+            self.inputs[slot:slot + 2] = self.encode_bid((player, bid))
+        self.encoded_bids += 1
+
     # get only the currently valid bids
     def get_valid_bids(self):
         valid_bids = {bid: valid for bid, valid in self.possible_bids.items() if valid['valid']}
@@ -96,42 +133,31 @@ class BidBot:
     
     # choose a bid from the list of valid bids
     def choose_bid(self):
+        return self.all_bids[self.choose_bid_index()]
+
+    # same as choose_bid, but returns the index of the bid in all_bids
+    def choose_bid_index(self):
 
         # work out which are valid
         self.set_valid_bids()   
         self.assign_priorities()
-        bids = self.get_valid_bids()
         
-        # select bid with highest priority
-        highest_priority_bid = max(bids, key=lambda bid: bids[bid]['priority'])
-
-        return highest_priority_bid
+        # select bid with highest priority, the first one if several are equal
+        return int(np.argmax(np.where(self.valid, self.priorities, -np.inf)))
     
 
+    # cards are ids from Deal.py, encoded as their index in ranks and suits above
     def encode_card(self,card):
-        suit = card[-1]
-        rank = card[:-1]
-        return [self.rank_to_int[rank], self.suit_to_int[suit]]
+        return [12 - card % 13, 3 - card // 13]
     
+    # bids from the auction are already (player, bid) integers
     def encode_bid(self, bid):
-        player = self.player_to_int[bid[0]]
-        bid_int = self.bid_to_int[bid[1]]
-        return [player, bid_int]
+        return list(bid)
 
     # encode vulnerability, hand details and previous bids for the input to the net
+    # the buffer is kept up to date by update_previous_bids, so there is nothing left to encode
     def encode_input(self):
-        encoded = [int(self.vulnerability)]
-        
-        for card in self.hand:
-            encoded.extend(self.encode_card(card))
-
-        for bid in self.previous_bids:
-            encoded.extend(self.encode_bid(bid))
-
-        while len(encoded) < 200:
-            encoded.extend([-1])
-
-        return encoded
+        return self.inputs
 
     # run game details through net and assign priorities to possible bids based on output
     def assign_priorities(self):
@@ -139,8 +165,7 @@ class BidBot:
         NNoutput = self.net.activate(NNinput)
         # print(f"bot: {self.name} with output: {NNoutput}")
 
-        for i, bid in enumerate(self.possible_bids):
-            self.possible_bids[bid]['priority'] = NNoutput[i]
+        self.priorities[:] = NNoutput
 
         
             
@@ -148,78 +173,15 @@ class BidBot:
 
     # find contract and player of last bid
     def get_last_bid(self):
-        
-        # Move down the list of bids until a bid that isnt PASS, X or XX
-        index = len(self.previous_bids) - 1
-        while self.previous_bids[index][1] in ['PASS','X','XX'] and index >= 0:
-            index -= 1
-
-        last_player = self.previous_bids[index][0]
-        last_contract = self.previous_bids[index][1]
-
-        # Move down the list to find the last actual bid
-        index = len(self.previous_bids) - 1
-        while self.previous_bids[index][1] == 'PASS' and index >= 0:
-            index -= 1
-
-        last_bid = self.previous_bids[index][1]
-        if last_bid in ['X','XX']:
-            doubled = last_bid
-        else:
-            doubled = 'N'
-
-        return last_player, last_contract, doubled
+        return self.auction.get_last_bid()
     
 
+    @timed('legal_bids')
     def set_valid_bids(self):
 
-        bids = ['PASS']
-        bid_options = master_options.copy()
+        # the auction knows the legal bids without looking through the bidding, a row of the shared table
+        self.valid = self.auction.legal_bids(self.seat)
         
-        # remove the options until you reach the current last bid
-        if len(self.previous_bids) > 0:
-            last_player, last_bid , doubled = self.get_last_bid()
-        
-        
-            if last_bid != 'PASS':
-                while bid_options[0] != last_bid:
-                    bid_options.pop(0)
-                bid_options.pop(0) # remove current bid
-
-                if self.name in ['N', 'S']:
-                    opponents = ['E', 'W']
-                else: 
-                    opponents = ['N', 'S']
-
-                # determine if doubling is possible
-                if last_player in opponents and doubled not in ['X','XX']:
-                
-                    bids.append('X')
-
-                if last_player not in opponents and doubled == 'X':
-                
-                    bids.append('XX')
-        
-
-        bids.append(bid_options)
-        valid_bids =  self.flatten(bids)
-
-        # change valid flag on possible bids
-        for bid in self.possible_bids:
-            if bid in valid_bids:
-                self.possible_bids[bid]['valid'] = True
-            else:
-                self.possible_bids[bid]['valid'] = False
-        
-    
-    def flatten(self, lst):
-        flat_list = []
-        for item in lst:
-            if isinstance(item, list):
-                flat_list.extend(self.flatten(item))
-            else:
-                flat_list.append(item)
-        return flat_list
     
     def get_team(self):
         return self.my_team
\ No newline at end of file
@@ -0,0 +1,124 @@
+import gzip
+import itertools
+import os
+import pickle
+import random
+import threading
+import neat
+import DSS_adapter
+from FitnessCache import fitness_cache
+"""Checkpoints of a training run, written in the background, and resuming from them.
+
+A checkpoint holds everything needed to carry on exactly where the run stopped: the population and
+species, the best genome so far, the genome and node key counters, the state of python's
+random module (used by NEAT) and of the numpy Generator the deal pools are drawn from, the
+solved tables in the DDS cache, the fitness cache, and how far the DealPipeline's producers or
+the DealStream's file have got.
+
+The state is pickled in the main thread at the end of a generation, as it is changed by the next one.
+Compressing and writing happen in a background thread, into a temporary file that is synced and
+renamed over the checkpoint, so a crash never leaves a half written checkpoint behind.
+"""
+
+
+# write data to path, so that path is either the old file or the complete new one
+def write_atomic(path, data):
+    temporary = path + '.tmp'
+    with open(temporary, 'wb') as f:
+        f.write(gzip.compress(data, compresslevel=5))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, path)
+
+
+class Checkpointer(neat.reporting.BaseReporter):
+
+    # checkpoint population every generation_interval generations, to filename_prefix<next generation>
+    # rng is the numpy Generator the deal pools are drawn from, deals the DealPipeline or DealStream they come from
+    def __init__(self, population, rng, generation_interval=5, filename_prefix='neat-checkpoint-', deals=None):
+        self.population = population
+        self.rng = rng
+        self.deals = deals
+        self.generation_interval = generation_interval
+        self.filename_prefix = filename_prefix
+        self.thread = None
+
+    def end_generation(self, config, population, species_set):
+        # the population has already been reproduced, it is the one of the next generation
+        generation = self.population.generation + 1
+        if generation % self.generation_interval == 0:
+            self.save_checkpoint(generation)
+
+    def save_checkpoint(self, generation):
+        data = self.snapshot(generation)
+
+        # one write at a time, the last one has almost always finished by now
+        self.wait()
+        filename = f"{self.filename_prefix}{generation}"
+        self.thread = threading.Thread(target=write_atomic, args=(filename, data))
+        self.thread.start()
+
+    # the pickled training state, to start again at generation
+    def snapshot(self, generation):
+        reproduction = self.population.reproduction
+
+        # the next genome and node keys, a count can't be looked at without taking the key
+        next_key = next(reproduction.genome_indexer)
+        reproduction.genome_indexer = itertools.count(next_key)
+        genome_config = self.population.config.genome_config
+        next_node_key = None
+        if genome_config.node_indexer is not None:
+            next_node_key = next(genome_config.node_indexer)
+            genome_config.node_indexer = itertools.count(next_node_key)
+
+        # the species keep the reporters, which can't all be pickled and aren't needed
+        species = self.population.species
+        reporters = species.reporters
+        species.reporters = None
+        try:
+            state = {'generation': generation,
+                     'population': self.population.population,
+                     'species': species,
+                     'best_genome': self.population.best_genome,
+                     'next_genome_key': next_key,
+                     'next_node_key': next_node_key,
+                     'ancestors': reproduction.ancestors,
+                     'random_state': random.getstate(),
+                     'rng_state': self.rng.bit_generator.state,
+                     'dd_tables': DSS_adapter.get_cached_tables(),
+                     'fitness_cache': fitness_cache.get_state(),
+                     'deals': self.deals.get_state() if self.deals is not None else None}
+            return pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)
+        finally:
+            species.reporters = reporters
+
+    # wait for the last checkpoint to be written
+    def wait(self):
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def close(self):
+        self.wait()
+
+
+# returns a Population that continues from the checkpoint in filename, and the state of its DealPipeline or
+# DealStream to start a new one with, rng gets the state it had
+def restore_checkpoint(filename, config, rng):
+    with gzip.open(filename) as f:
+        state = pickle.load(f)
+
+    random.setstate(state['random_state'])
+    rng.bit_generator.state = state['rng_state']
+    DSS_adapter.put_cached_tables(state['dd_tables'])
+    if 'fitness_cache' in state:
+        fitness_cache.set_state(state['fitness_cache'])
+
+    population = neat.Population(config, (state['population'], state['species'], state['generation']))
+    population.species.reporters = population.reporters
+    population.best_genome = state['best_genome']
+    population.reproduction.genome_indexer = itertools.count(state['next_genome_key'])
+    population.reproduction.ancestors = state['ancestors']
+    if state['next_node_key'] is not None:
+        config.genome_config.node_indexer = itertools.count(state['next_node_key'])
+    return population, state.get('deals')
@@ -1,7 +1,13 @@
 import ctypes
 from ctypes import c_int, c_uint, POINTER
-from Scoring import get_score_from_result
+from collections import OrderedDict
+import numpy as np
+from Scoring import score_contracts
+from Scoring import strains as score_strains
 import os
+import threading
+import Timing
+from Timing import timed
 """This is a set of helper functions to calculate the best possible contract from any given deal
 It uses the Double Dummy Solver (DDS) algorithm, defined and implemented by Bo Haglund / Soren Hein 2014-2018.
 https://github.com/dds-bridge/dds/blob/develop/README.md
@@ -9,42 +15,163 @@ https://github.com/dds-bridge/dds/blob/develop/README.md
 The DDS is implemented in C++ and provides an interface to the functions in libdds.so
 """
 
-# 
-
 # IMPORTANT: This is set up to run on a linux system, this section should change to run on any other system
-# Define the path to the shared library
-lib_path = os.path.abspath('./dds/src/libdds.so')
-# Load the shared library
-libdds = ctypes.CDLL(lib_path)
+# Path to the shared library, the bundled build next to this file unless the DDS_LIBRARY environment variable is set
+lib_path = os.environ.get('DDS_LIBRARY', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dds', 'src', 'libdds.so'))
+
+# the library is only loaded when the solver is first used, see get_library
+libdds = None
+load_lock = threading.Lock()
+
+# DDS has one thread pool and one set of transposition tables per process, so its functions can't run
+# in several threads at once, they are called under this lock. ctypes releases the GIL during a call,
+# so other threads carry on with Python work while a deal is solved. The par functions only work on the
+# table they are given and don't need it.
+solver_lock = threading.Lock()
+
+# (max memory in MB, max threads) for SetResources, applied when the library is loaded
+resources = None
+
+# threading systems for set_threading, DDS refuses those it wasn't compiled with
+threading_systems = {'basic': 0, 'winapi': 1, 'openmp': 2, 'gcd': 3, 'boost': 4,
+                     'stl': 5, 'tbb': 6, 'stlimpl': 7, 'pplimpl': 8}
 
 # Constants
 DDS_HANDS = 4
 DDS_SUITS = 4
 DDS_STRAINS = 5
+MAXNOOFTABLES = 40
 
 # Define the ddTableDeal struct
 class ddTableDeal(ctypes.Structure):
     _fields_ = [("cards", c_uint * DDS_SUITS * DDS_HANDS)]
 
-tableDeal = ddTableDeal()
-
 # Define the ddTableResults struct
 class ddTableResults(ctypes.Structure):
     _fields_ = [("resTable", c_int * DDS_HANDS * DDS_STRAINS)]
 
-tableResults = ddTableResults()
-
-# Define the CalcDDtable function prototype
-libdds.CalcDDtable.argtypes = (ddTableDeal, POINTER(ddTableResults))
-libdds.CalcDDtable.restype = c_int
+# Define the structs for solving many deals at once
+class ddTableDeals(ctypes.Structure):
+    _fields_ = [("noOfTables", c_int),
+                ("deals", ddTableDeal * (MAXNOOFTABLES * DDS_STRAINS))]
 
+class ddTablesRes(ctypes.Structure):
+    _fields_ = [("noOfBoards", c_int),
+                ("results", ddTableResults * (MAXNOOFTABLES * DDS_STRAINS))]
 
-# Constants for the card ranks
-card_ranks = {
-    '2': 0x0004, '3': 0x0008, '4': 0x0010, '5': 0x0020,
-    '6': 0x0040, '7': 0x0080, '8': 0x0100, '9': 0x0200,
-    'T': 0x0400, 'J': 0x0800, 'Q': 0x1000, 'K': 0x2000, 'A': 0x4000
-}
+class parResults(ctypes.Structure):
+    _fields_ = [("parScore", ctypes.c_char * 16 * 2),
+                ("parContractsString", ctypes.c_char * 128 * 2)]
+
+class allParResults(ctypes.Structure):
+    _fields_ = [("presults", parResults * MAXNOOFTABLES)]
+
+# Define the structs for the par results of DealerParBin
+class contractType(ctypes.Structure):
+    _fields_ = [("underTricks", c_int),
+                ("overTricks", c_int),
+                ("level", c_int),
+                ("denom", c_int),
+                ("seats", c_int)]
+
+class parResultsMaster(ctypes.Structure):
+    _fields_ = [("score", c_int),
+                ("number", c_int),
+                ("contracts", contractType * 10)]
+
+# use another build of the library, before the solver is first used
+def set_library_path(path):
+    global lib_path
+    if libdds is not None:
+        raise RuntimeError(f"libdds is already loaded from {lib_path}")
+    lib_path = path
+
+
+# Load the shared library on first use and define the function prototypes
+def get_library():
+    global libdds
+    if libdds is not None:
+        return libdds
+
+    with load_lock:
+        if libdds is None:
+            libdds = load_library(lib_path)
+    return libdds
+
+
+def load_library(path):
+    library = ctypes.CDLL(path)
+
+    # Define the CalcDDtable function prototype
+    library.CalcDDtable.argtypes = (ddTableDeal, POINTER(ddTableResults))
+    library.CalcDDtable.restype = c_int
+
+    # Define the CalcAllTables function prototype
+    library.CalcAllTables.argtypes = (POINTER(ddTableDeals), c_int, POINTER(c_int * DDS_STRAINS),
+                                      POINTER(ddTablesRes), POINTER(allParResults))
+    library.CalcAllTables.restype = c_int
+
+    # Define the DealerParBin function prototype
+    library.DealerParBin.argtypes = (POINTER(ddTableResults), POINTER(parResultsMaster), c_int, c_int)
+    library.DealerParBin.restype = c_int
+
+    # Define the prototypes of the thread and memory settings
+    library.SetMaxThreads.argtypes = (c_int,)
+    library.SetMaxThreads.restype = None
+    library.SetResources.argtypes = (c_int, c_int)
+    library.SetResources.restype = None
+    library.SetThreading.argtypes = (c_int,)
+    library.SetThreading.restype = c_int
+
+    # loading the library has set it up with a thread per core and no memory limit
+    if resources is not None:
+        library.SetResources(*resources)
+
+    return library
+
+
+# limit the memory (in MB, 0 for no limit) and threads (0 for one per core) the solver uses
+# if the library isn't loaded yet, this is done when it is
+def set_resources(max_memory_mb, max_threads):
+    global resources
+    resources = (max_memory_mb, max_threads)
+    if libdds is not None:
+        with solver_lock:
+            libdds.SetResources(max_memory_mb, max_threads)
+
+
+# keeps the memory limit set before, DDS's own SetMaxThreads would put it back to no limit
+def set_max_threads(threads):
+    max_memory_mb = resources[0] if resources is not None else 0
+    set_resources(max_memory_mb, threads)
+
+
+# choose the threading system of the solver by name, see threading_systems
+def set_threading(system):
+    with solver_lock:
+        result = get_library().SetThreading(threading_systems[system])
+    if result != 1:
+        raise RuntimeError(f"SetThreading failed with code {result}, {system} threading is not available")
+
+
+# structs reused by the calls of one thread
+thread_buffers = threading.local()
+
+def get_buffers():
+    if not hasattr(thread_buffers, 'tableResults'):
+        thread_buffers.tableResults = ddTableResults()
+        thread_buffers.tableDeals = ddTableDeals()
+        thread_buffers.tablesRes = ddTablesRes()
+        thread_buffers.allParResults = allParResults()
+        thread_buffers.parResults = parResultsMaster()
+    return thread_buffers
+
+
+# Constants for the cards, indexed by the card ids of Deal.py
+# the suit of a card is its DDS suit index (0 for 'S', 1 for 'H', etc.)
+# the rank of a card is its DDS bit value, from 0x4000 for 'A' down to 0x0004 for '2'
+card_suits = np.arange(52) // 13
+card_ranks = 1 << (14 - np.arange(52) % 13)
 
 # Constants for the suits
 suits = {'S': 0, 'H': 1, 'D': 2, 'C': 3, 'NT': 4}
@@ -52,64 +179,250 @@ suits = {'S': 0, 'H': 1, 'D': 2, 'C': 3, 'NT': 4}
 # Constants for hands
 hands = {'N': 0, 'E': 1, 'S': 2, 'W': 3}
 
+# Constants for the par functions: vulnerability codes, contract denominations and declaring seats
+par_vulnerability = {'none': 0, 'BOTH': 1, 'N/S': 2, 'E/W': 3}
+par_denoms = ['NT', 'S', 'H', 'D', 'C']
+par_seats = ['N', 'E', 'S', 'W', 'N', 'E']
+
+# Maximum number of solved tables kept in the cache
+DD_CACHE_SIZE = 4096
+
+
+# Bounded LRU cache of solved tables, keyed by the canonical form of a deal.
+# One auction asks for the same table from GameState and from every BidBot, so
+# all of them share this cache instead of calling the solver again.
+# Tables are read-only arrays indexed like resTable, so they can be handed out to any thread.
+class TableCache:
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.tables = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            table = self.tables.get(key)
+            if table is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self.tables.move_to_end(key)
+            return table
+
+    def put(self, key, table):
+        with self.lock:
+            self.tables[key] = table
+            self.tables.move_to_end(key)
+
+            # drop the least recently used tables
+            while len(self.tables) > self.max_size:
+                self.tables.popitem(last=False)
+
+    def items(self):
+        with self.lock:
+            return list(self.tables.items())
+
+    def clear(self):
+        with self.lock:
+            self.tables.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self.tables)}
+
+
+table_cache = TableCache(DD_CACHE_SIZE)
+
+# par contracts as (team, contract, score), keyed by the deal, vulnerability and dealer
+# the ones return_best_contract works out, and the ones that came with a deal, e.g. from the PAR lines of a
+# DDS test file, so the par of a deal is only worked out once
+par_cache = TableCache(DD_CACHE_SIZE)
+
 
 # ------------------------------------------------------------------
 
 
 
-# Function to convert initial deal format to CalcDDtable.cpp format
+# Function to convert a deal of card ids to CalcDDtable.cpp format, a cards[hand][suit] array of suit masks
 def convert_initial_to_DDS_format(initial):
-    # Initialize a 2D list for deal with zeros
-    deal = [[0 for _ in range(4)] for _ in range(4)]
-    
-    # Iterate over each hand and its cards in the initial dictionary
-    for hand, cards in initial.items():
-        # Iterate over each card in the hand
-        for card in cards:
-            # Ensure '10' is represented as 'T'
-            rank_char = 'T' if card.startswith('10') else card[0]
-            
-            # Ensure we have a valid rank character
-            if rank_char not in card_ranks:
-                raise ValueError(f"Invalid card rank: {rank_char}")
-            
-            rank = card_ranks[rank_char]  # Get the bit value for the card rank
-            suit = suits[card[-1]]        # Get the suit index (0 for 'S', 1 for 'H', etc.)
-            hand_idx = hands[hand]        # Get the hand index (0 for 'N', 1 for 'E', etc.)
-            deal[suit][hand_idx] |= rank  # Set the corresponding bit in the deal structure
-    
-    return deal
+    # slot of each card in the flattened cards[hand][suit] array
+    slots = np.arange(DDS_HANDS)[:, np.newaxis] * DDS_SUITS + card_suits[initial]
+
+    # every card is held once, so adding the rank bits of a suit sets them
+    deal = np.bincount(slots.ravel(), weights=card_ranks[initial].ravel(), minlength=DDS_HANDS * DDS_SUITS)
+    return deal.astype(np.uint32).reshape(DDS_HANDS, DDS_SUITS)
+
+
+# Function to convert a CalcDDtable.cpp format deal back to card ids
+def convert_DDS_to_initial_format(cards):
+    # bits[hand][suit][value] for the values A down to 2
+    bits = (np.asarray(cards, dtype=np.int64)[:, :, np.newaxis] >> (14 - np.arange(13))) & 1
+    hand, suit, value = np.nonzero(bits)
+
+    # nonzero goes through the hands in order, and each hand comes out sorted
+    return (suit * 13 + value).reshape(DDS_HANDS, 13)
 
 
 def getExpectedTricks(initial, dealer, contract):
-    return getFullResults(initial).resTable[suits[contract]][hands[dealer]]
+    return int(getFullResults(initial)[suits[contract], hands[dealer]])
+
+
+
 
+# canonical, hashable form of a deal: the suit masks of every hand
+def deal_key(deal):
+    return deal.tobytes()
 
 
+# read-only copy of a table indexed like resTable, as kept in the cache
+def as_table(table):
+    table = np.array(table, dtype=np.int32).reshape(DDS_STRAINS, DDS_HANDS)
+    table.flags.writeable = False
+    return table
 
+
+# the solved table of a deal, an array indexed like resTable
 def getFullResults(initial):
 
     # Get DDS format
     deal = convert_initial_to_DDS_format(initial)
 
+    # reuse the table if this deal has been solved already
+    key = deal_key(deal)
+    cached = table_cache.get(key)
+    if cached is not None:
+        return cached
+
     # add values to appropriate struct
-    for h in range(DDS_HANDS):
-        for s in range(DDS_SUITS):
-            tableDeal.cards[h][s] = deal[s][h]
+    tableDeal = ddTableDeal.from_buffer_copy(deal)
 
+    # Call the function from the libdds.so library
+    tableResults = get_buffers().tableResults
+    library = get_library()
+    with solver_lock:
+        started = Timing.start()
+        result = library.CalcDDtable(tableDeal, ctypes.byref(tableResults))
+        Timing.stop('dds_solve', started)
+    if result != 1:
+        raise RuntimeError(f"CalcDDtable failed with code {result}")
 
+    table = as_table(tableResults.resTable)
+    table_cache.put(key, table)
+
+    return table
 
-    # Call the function from the libdds.so library
-    result = libdds.CalcDDtable(tableDeal, ctypes.byref(tableResults))
 
-    
-    
+# solve a list of deals in as few library calls as possible
+# returns an array of shape (len(deals), DDS_STRAINS, DDS_HANDS), indexed like resTable
+def solve_deals(initials):
 
-    return tableResults
+    keys = []
+    solved = {}
+    unsolved = {}
+    for initial in initials:
+        deal = convert_initial_to_DDS_format(initial)
+        key = deal_key(deal)
+        keys.append(key)
+        if key in solved or key in unsolved:
+            continue
+
+        cached = table_cache.get(key)
+        if cached is not None:
+            solved[key] = cached
+        else:
+            unsolved[key] = deal
+
+    # CalcAllTables takes at most MAXNOOFTABLES deals when all strains are solved
+    pending = list(unsolved.items())
+    for start in range(0, len(pending), MAXNOOFTABLES):
+        solved.update(solve_chunk(pending[start:start + MAXNOOFTABLES]))
+
+    tables = np.empty((len(initials), DDS_STRAINS, DDS_HANDS), dtype=np.int32)
+    for i, key in enumerate(keys):
+        tables[i] = solved[key]
+
+    return tables
+
+
+# solve up to MAXNOOFTABLES (key, deal) pairs with one CalcAllTables call
+# the tables are added to the cache and returned as {key: table}
+@timed('dds_solve')
+def solve_chunk(chunk):
+    buffers = get_buffers()
+
+    tableDeals = buffers.tableDeals
+    tableDeals.noOfTables = len(chunk)
+    for i, (key, deal) in enumerate(chunk):
+        tableDeals.deals[i] = ddTableDeal.from_buffer_copy(deal)
+
+    # solve every strain, mode -1 skips the par calculation
+    trumpFilter = (c_int * DDS_STRAINS)(0, 0, 0, 0, 0)
+    tablesRes = buffers.tablesRes
+    parRes = buffers.allParResults
+
+    library = get_library()
+    with solver_lock:
+        result = library.CalcAllTables(ctypes.byref(tableDeals), -1, ctypes.byref(trumpFilter),
+                                       ctypes.byref(tablesRes), ctypes.byref(parRes))
+    if result != 1:
+        raise RuntimeError(f"CalcAllTables failed with code {result}")
+
+    solved = {}
+    for i, (key, deal) in enumerate(chunk):
+        solved[key] = as_table(tablesRes.results[i].resTable)
+        table_cache.put(key, solved[key])
+
+    return solved
+
+
+# add an already solved table (indexed like resTable) for a deal to the cache
+def store_results(initial, table):
+    table_cache.put(deal_key(convert_initial_to_DDS_format(initial)), as_table(table))
+
+
+# add a par contract, as returned by par_contracts, for a deal to the cache
+def store_par(initial, vuln, dealer, par):
+    par_cache.put((deal_key(convert_initial_to_DDS_format(initial)), vuln, dealer), par)
+
+
+# hit / miss counters of the table cache
+def get_cache_stats():
+    return table_cache.stats()
+
+
+def clear_cache():
+    table_cache.clear()
+    par_cache.clear()
+
+# the cached tables as (key, table) pairs, tables indexed like resTable, to save them with a checkpoint
+def get_cached_tables():
+    return table_cache.items()
+
+def put_cached_tables(tables):
+    for key, table in tables:
+        table_cache.put(key, as_table(table))
+
+# mode 'max' is the highest scoring makeable contract
+# mode 'par' is the par contract for the dealer, including sacrifices, from the solver's par functions
+def return_best_contract(deal, vuln, dealer=0, mode='max'):
+    if mode == 'par':
+        key = (deal_key(convert_initial_to_DDS_format(deal)), vuln, dealer)
+        par = par_cache.get(key)
+        if par is not None:
+            return par
 
-def return_best_contract(deal, vuln):
     full_results = getFullResults(deal)
 
+    if mode == 'par':
+        par = par_contracts([full_results], [vuln], [dealer])[0]
+        par_cache.put(key, par)
+        return par
+
     player, contract , score = find_max(full_results,vuln)
 
     # print(f"highest ideal bid: {contract} by {player} for a score of: {score}")
@@ -121,46 +434,67 @@ def return_best_contract(deal, vuln):
     return team, contract , score
 
 
-# find the best possible score for each contract
-def find_max(table, vuln):
-    best_value = -float('inf')
-    best_player = None
-    best_contract = None
+# par contracts of a batch of solved tables (ddTableResults, or arrays indexed like resTable)
+# returns (team, contract, score) for each table, with the score for the declaring team like return_best_contract
+@timed('dds_par')
+def par_contracts(tables, vulns, dealers):
+    parResults = get_buffers().parResults
+    library = get_library()
+    contracts = []
 
-    suits = ['S','H','D','C','NT']
-    players = ['N','E','S','W']
+    for table, vuln, dealer in zip(tables, vulns, dealers):
+        if not isinstance(table, ddTableResults):
+            table = ddTableResults.from_buffer_copy(np.ascontiguousarray(table, dtype=np.int32))
+
+        result = library.DealerParBin(ctypes.byref(table), ctypes.byref(parResults), dealer, par_vulnerability[vuln])
+        if result != 1:
+            raise RuntimeError(f"DealerParBin failed with code {result}")
+
+        # passed out, DDS still gives one entry, with a score of 0 and no contract
+        if parResults.number == 0 or parResults.score == 0:
+            contracts.append((['N','S'], 'PASS', 0))
+            continue
 
+        # all par contracts have the same score, take the first one
+        par = parResults.contracts[0]
+        contract = str(par.level) + par_denoms[par.denom]
+        if par.underTricks > 0:
+            contract += 'X'
 
+        # the score is from the N/S view
+        if par_seats[par.seats] in ['N','S']:
+            contracts.append((['N','S'], contract, parResults.score))
+        else:
+            contracts.append((['E','W'], contract, -parResults.score))
 
+    return contracts
 
-    for strain in range(DDS_STRAINS):
-        for hand in range(DDS_HANDS):
 
-            entry = table.resTable[strain][hand]
-            if entry > 6:
-                
-                contract = str(entry-6) + suits[strain]
-                doubled = 'N'
-                declarer = players[hand]
+# find the best possible score for each contract
+def find_max(table, vuln):
+    players = ['N','E','S','W']
+
+    # tricks[strain][hand], strains in the same order as the score table
+    tricks = np.asarray(table)
+    levels = tricks - 6
+    making = levels > 0
 
-                if vuln == 'BOTH':
-                    vulnerable = True
-                else: 
-                    vulnerable = declarer in vuln
+    # vulnerability of each hand as declarer
+    vulnerable = np.array([vuln == 'BOTH' or declarer in vuln for declarer in players])
 
-                making = entry
-                
-                value = get_score_from_result(contract, doubled, declarer, vulnerable, making)
-                
+    # score every making contract undoubled, in one lookup
+    strains = np.arange(DDS_STRAINS)[:, np.newaxis]
+    values = score_contracts(np.clip(levels, 1, 7), strains, 0, vulnerable[np.newaxis, :], tricks)
+    values = np.where(making, values, -float('inf'))
 
-                if value > best_value:
-                    best_value = value
-                    best_player = declarer
-                    best_contract = contract
+    # argmax takes the first best contract, going through the strains and then the hands
+    strain, hand = np.unravel_index(np.argmax(values), values.shape)
+    if not making[strain, hand]:
+        return None, None, -float('inf')
 
-    return best_player, best_contract, best_value      
+    best_contract = str(levels[strain, hand]) + score_strains[strain]
+    return players[hand], best_contract, int(values[strain, hand])
 
-    
 
    
 # Function to print the table results
@@ -171,10 +505,10 @@ def printTable(table):
 
     print(f"{'':>5} {'North':>5} {'South':>5} {'East':>5} {'West':>5}")
 
-    print(f"{'NT':>5} {table.resTable[4][0]:>5} {table.resTable[4][2]:>5} {table.resTable[4][1]:>5} {table.resTable[4][3]:>5}")
+    print(f"{'NT':>5} {table[4][0]:>5} {table[4][2]:>5} {table[4][1]:>5} {table[4][3]:>5}")
 
     for suit in range(DDS_SUITS):
-        print(f"{dcardSuit[suit]:>5} {table.resTable[suit][0]:>5} {table.resTable[suit][2]:>5} {table.resTable[suit][1]:>5} {table.resTable[suit][3]:>5}")
+        print(f"{dcardSuit[suit]:>5} {table[suit][0]:>5} {table[suit][2]:>5} {table[suit][1]:>5} {table[suit][3]:>5}")
     print()
 
 
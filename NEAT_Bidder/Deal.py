@@ -1,4 +1,5 @@
-import random
+import numpy as np
+from Timing import timed
 
 
 # THESE ARE ALL HELPER FUNCTIONS TO DEAL AND DISPLAY CARDS
@@ -7,34 +8,42 @@ import random
 suits = ['S','H','D','C']
 values = ['A', 'K', 'Q', 'J', '10', '9', '8', '7', '6', '5', '4', '3', '2']
 players = ['N','E','S','W']
+vulnerabilities = ['none', 'N/S', 'E/W', 'BOTH']
 
 bid_options = [level + suit for level in ['1','2','3','4','5','6','7'] for suit in ['C','D','H','S','NT']]
 
+# Cards are integers 0-51: card = suit index * 13 + value index, with the orders above.
+# Sorting the card ids of a hand sorts it by suit S, H, D, C and then from A down to 2.
+# A deal is a (4, 13) array of card ids, one sorted row per player N, E, S, W.
+
+# random generator used when no other is given
+default_rng = np.random.default_rng()
+
 # return a random deal, to 4 players N, E, S W
-def random_deal():
-    deck = [f"{value}{suit}" for suit in suits for value in values]
-    # Shuffle the deck
-    random.shuffle(deck)
-    # Deal the cards to 4 players
-    players_cards = {f"{players[i]}": deck[i*13:(i+1)*13] for i in range(4)}
+# rng is a numpy random Generator, seed it to make the deals reproducible
+@timed('deal')
+def random_deal(rng=default_rng):
+    deal = rng.permutation(52).reshape(4, 13)
     # sort each player's hand
-    sorted_players_hands = {player: sort_player_hand(cards) for player, cards in players_cards.items()}
+    deal.sort(axis=1)
+    return deal
 
-    return sorted_players_hands
 
-def sort_player_hand( hand):
-        # Define sorting helpers
-        suit_priority = {'S':0,'H':1,'D':2,'C':3}
-        value_priority = {value: i for i, value in enumerate(values)}
+# string forms of cards, only for display and logging
+def card_to_string(card):
+    return values[card % 13] + suits[card // 13]
 
-        # Sort function for cards
-        def card_sort_key(card):
-            # print(card)
-            value, suit = card[:-1] , card[-1]
-            return (suit_priority[suit], value_priority[value])
+def card_from_string(card):
+    return suits.index(card[-1]) * 13 + values.index(card[:-1])
 
-        # Sort and return the hand
-        return sorted(hand, key=card_sort_key)
+def hand_to_strings(hand):
+    return [card_to_string(card) for card in hand]
+
+# build a deal from a dict of string hands, e.g. {'N': ['AS', '10H', ...], 'E': [...], ...}
+def deal_from_strings(hands):
+    deal = np.array([[card_from_string(card) for card in hands[player]] for player in players])
+    deal.sort(axis=1)
+    return deal
 
 
 # print deal in good format to read
@@ -59,12 +68,14 @@ def print_deal(deal):
         else:
             offset, line = 0, 4
 
+        cards = hand_to_strings(deal[h])
+
         for s, suit in enumerate(SUITS):
             c = offset
             for rank in RANKS:
                 
                 card = rank + suit
-                if card in deal[hand]:
+                if card in cards:
                     if rank == '10':
                         text[line + s][c] = '1'
                         text[line + s][c + 1] = '0'
@@ -0,0 +1,69 @@
+import argparse
+import numpy as np
+from Deal import random_deal, vulnerabilities, players
+from DSS_adapter import convert_initial_to_DDS_format, convert_DDS_to_initial_format, solve_deals
+"""A corpus of pre-solved deals stored as fixed-width binary records.
+
+The corpus is generated offline with the DDS, and read during training through numpy.memmap,
+so no solving is needed while genomes are evaluated. Several processes reading the same file
+share one copy of it in the page cache.
+
+Generate a corpus with:
+
+    python3 DealCorpus.py deals.bin 1000000
+"""
+
+# One record per deal, vulnerability and dealer are indices into the lists in Deal.py:
+#   cards: suit masks as in ddTableDeal, cards[hand][suit]
+#   tricks: double dummy tricks as in ddTableResults, tricks[strain][hand]
+record_dtype = np.dtype([('cards', '<u2', (4, 4)),
+                         ('tricks', 'u1', (5, 4)),
+                         ('vulnerability', 'u1'),
+                         ('dealer', 'u1')])
+
+
+class DealCorpus:
+
+    def __init__(self, path):
+        self.path = path
+        self.records = np.memmap(path, dtype=record_dtype, mode='r')
+
+    def __len__(self):
+        return len(self.records)
+
+    # returns the deal, vulnerability, dealer index and trick table of a record
+    def get(self, index):
+        record = self.records[index]
+        deal = convert_DDS_to_initial_format(record['cards'])
+        vulnerable = vulnerabilities[record['vulnerability']]
+        return deal, vulnerable, int(record['dealer']), np.array(record['tricks'])
+
+
+# write count random deals with their solved tables to path, rng is a numpy random Generator
+def generate_corpus(path, count, rng, batch_size=400):
+
+    with open(path, 'wb') as f:
+        for start in range(0, count, batch_size):
+            size = min(batch_size, count - start)
+
+            deals = [random_deal(rng) for _ in range(size)]
+            tables = solve_deals(deals)
+
+            records = np.zeros(size, dtype=record_dtype)
+            records['cards'] = [convert_initial_to_DDS_format(deal) for deal in deals]
+            records['tricks'] = tables
+            records['vulnerability'] = rng.integers(len(vulnerabilities), size=size)
+            records['dealer'] = rng.integers(len(players), size=size)
+
+            records.tofile(f)
+            print(f"{start + size} / {count} deals written")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Generate a corpus of pre-solved deals")
+    parser.add_argument('path', help="output file")
+    parser.add_argument('count', type=int, help="number of deals")
+    parser.add_argument('--seed', type=int, default=None, help="seed for the random deals")
+    args = parser.parse_args()
+
+    generate_corpus(args.path, args.count, np.random.default_rng(args.seed))
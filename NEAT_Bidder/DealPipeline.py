@@ -0,0 +1,151 @@
+import queue
+import threading
+import time
+import Timing
+from Deal import random_deal, vulnerabilities, players
+from DSS_adapter import solve_deals, MAXNOOFTABLES
+"""A queue of solved deals, filled by background threads while the auctions are played.
+
+Producer threads deal batches of deals, solve them and put (deal, vulnerable, dealer, table) records
+into a bounded queue, the same records as Evaluation.draw_deal_pool. The solver releases the GIL, so
+the auctions of one generation run while the deals of the next are being solved.
+
+The counters show which side is waiting: a consumer starved by an empty queue means training is
+solver-bound, producers blocked by a full queue mean it is bound by the auctions and networks.
+The time spent waiting is also recorded as the 'pipeline_starved' and 'pipeline_blocked' stages of
+Timing. With a single producer the records come out in the same order for the same rng, with more
+they come out in whatever order they are solved.
+
+get_state is the starting state of every producer and how many of its records were taken, a pipeline
+made with that state carries on with the records that weren't, to resume from a checkpoint.
+"""
+
+
+class DealPipeline:
+
+    # rng is a numpy random Generator, each producer gets its own generator spawned from it
+    # state is from get_state, the producers start where that pipeline's records were taken up to
+    def __init__(self, rng, producers=1, depth=4 * MAXNOOFTABLES, batch_size=MAXNOOFTABLES, state=None):
+        self.queue = queue.Queue(maxsize=depth)
+        self.batch_size = batch_size
+        self.stopping = threading.Event()
+        self.error = None
+
+        self.lock = threading.Lock()
+        self.records = 0
+        self.starved = 0
+        self.starved_seconds = 0.0
+        self.blocked = 0
+        self.blocked_seconds = 0.0
+
+        producer_rngs = rng.spawn(producers)
+        if state is None:
+            self.rng_states = [producer_rng.bit_generator.state for producer_rng in producer_rngs]
+            self.taken = [0] * producers
+        else:
+            if len(state['rng_states']) != producers:
+                raise ValueError(f"the pipeline state has {len(state['rng_states'])} producers, not {producers}")
+            self.rng_states = state['rng_states']
+            self.taken = list(state['taken'])
+            for producer_rng, rng_state in zip(producer_rngs, self.rng_states):
+                producer_rng.bit_generator.state = rng_state
+
+        self.threads = [threading.Thread(target=self.produce, args=(index, producer_rng, skip), daemon=True)
+                        for index, (producer_rng, skip) in enumerate(zip(producer_rngs, self.taken))]
+        for thread in self.threads:
+            thread.start()
+
+    # the records of producer index, the first skip of them were taken before and aren't solved
+    def produce(self, index, rng, skip):
+        try:
+            while not self.stopping.is_set():
+                # everything is drawn before solving, so skipped records use up the same draws
+                deals = [random_deal(rng) for _ in range(self.batch_size)]
+                draws = [(vulnerabilities[rng.integers(len(vulnerabilities))], int(rng.integers(len(players))))
+                         for _ in deals]
+                skipped = min(skip, len(deals))
+                skip -= skipped
+                if skipped == len(deals):
+                    continue
+
+                tables = solve_deals(deals[skipped:])
+                for deal, (vulnerable, dealer), table in zip(deals[skipped:], draws[skipped:], tables):
+                    if not self.put((index, (deal, vulnerable, dealer, table))):
+                        return
+        except Exception as error:
+            # the consumer raises it on its next get
+            self.error = error
+
+    # put an (index, record) item in the queue, waiting while it is full, returns False if the pipeline is closed
+    def put(self, item):
+        try:
+            self.queue.put_nowait(item)
+            return True
+        except queue.Full:
+            pass
+
+        started = time.perf_counter()
+        timing_started = Timing.start()
+        while not self.stopping.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                break
+            except queue.Full:
+                continue
+        Timing.stop('pipeline_blocked', timing_started)
+
+        with self.lock:
+            self.blocked += 1
+            self.blocked_seconds += time.perf_counter() - started
+        return not self.stopping.is_set()
+
+    # the next solved record, waits for the producers if the queue is empty
+    def get(self):
+        try:
+            index, record = self.queue.get_nowait()
+        except queue.Empty:
+            index, record = self.wait_for_item()
+
+        with self.lock:
+            self.records += 1
+            self.taken[index] += 1
+        return record
+
+    def wait_for_item(self):
+        started = time.perf_counter()
+        timing_started = Timing.start()
+        while True:
+            try:
+                item = self.queue.get(timeout=0.1)
+                break
+            except queue.Empty:
+                if self.error is not None:
+                    raise RuntimeError("a deal producer failed") from self.error
+        Timing.stop('pipeline_starved', timing_started)
+
+        with self.lock:
+            self.starved += 1
+            self.starved_seconds += time.perf_counter() - started
+        return item
+
+    # size records, e.g. the deal pool of a generation
+    def take(self, size):
+        return [self.get() for _ in range(size)]
+
+    def stats(self):
+        with self.lock:
+            return {'records': self.records,
+                    'starved': self.starved, 'starved_seconds': self.starved_seconds,
+                    'blocked': self.blocked, 'blocked_seconds': self.blocked_seconds,
+                    'queue_size': self.queue.qsize()}
+
+    # the producers' starting states and the records taken from each, for a checkpoint
+    def get_state(self):
+        with self.lock:
+            return {'rng_states': self.rng_states, 'taken': list(self.taken)}
+
+    # stop the producers, a batch being solved is finished first
+    def close(self):
+        self.stopping.set()
+        for thread in self.threads:
+            thread.join()
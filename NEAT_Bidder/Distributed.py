@@ -0,0 +1,283 @@
+import itertools
+import os
+import queue
+import secrets
+import tempfile
+import threading
+import time
+from multiprocessing.connection import Listener, Client, AuthenticationError
+from Evaluation import draw_deal_pool, init_worker, evaluate_pair, record_fitness
+from BatchedAuction import best_scores
+from GameState import GameState
+from FitnessCache import fitness_cache, deal_pool_id
+import Timing
+"""Evaluating genome pairs on worker processes of other machines, connected over TCP.
+
+The Coordinator takes the place of Evaluation.ParallelEvaluator in training. It listens for workers,
+which can connect at any time, and hands out one genome pair at a time to each of them. A worker
+first gets the NEAT configuration of the run, and once per generation the solved deal pool, so the
+workers never solve a deal themselves and play exactly the games a serial run would play.
+
+A task not answered within task_timeout seconds is handed out again, to the first worker that is free,
+and whichever answer comes first is used. Tasks of a worker whose connection breaks are handed out
+again straight away. A worker is one long-lived process, so the DDS library stays loaded and the
+cached networks and tables stay warm from one generation to the next.
+
+    NEAT_BIDDER_AUTHKEY=<key> python3 NEAT_bidder.py train --listen 0.0.0.0:6000
+    NEAT_BIDDER_AUTHKEY=<key> python3 NEAT_bidder.py worker --connect coordinator:6000
+
+The connections unpickle the messages they receive, so whoever can connect can run code on the
+coordinator and the workers. They authenticate with a shared key, taken from the NEAT_BIDDER_AUTHKEY
+environment variable. There is no built-in key: a coordinator started without one makes a random
+key and prints it, and a worker without one refuses to start. Only listen beyond localhost on a
+trusted network.
+"""
+
+default_port = 6000
+
+
+# the key in NEAT_BIDDER_AUTHKEY, None if it isn't set
+def environment_authkey():
+    key = os.environ.get('NEAT_BIDDER_AUTHKEY')
+    return key.encode() if key else None
+
+
+# a random key for a coordinator started without one, printed for the workers to use
+def new_authkey():
+    key = secrets.token_hex(16)
+    print(f"NEAT_BIDDER_AUTHKEY is not set, start the workers with NEAT_BIDDER_AUTHKEY={key}")
+    return key.encode()
+
+
+# "host:port" or "host" to an address for Listener and Client
+def parse_address(text):
+    host, _, port = text.rpartition(':')
+    if not host:
+        return text, default_port
+    return host, int(port)
+
+
+class Coordinator:
+
+    # address is where the workers connect to, port 0 picks a free one, see self.address
+    # authkey defaults to the key of the environment, or a new random one, see self.authkey
+    def __init__(self, config_path, trials, rng, address=('localhost', default_port), corpus=None, pipeline=None,
+                 task_timeout=120.0, authkey=None):
+        if authkey is None:
+            authkey = environment_authkey() or new_authkey()
+        self.trials = trials
+        self.rng = rng
+        self.corpus = corpus
+        self.pipeline = pipeline
+        self.task_timeout = task_timeout
+        self.authkey = authkey
+        with open(config_path) as f:
+            self.config_text = f.read()
+
+        # counts the calls to evaluate, like ParallelEvaluator, the deal pool of the current one and its best scores
+        self.generation = 0
+        self.deal_pool = None
+        self.ns_best = None
+
+        self.lock = threading.Lock()
+        self.finished = threading.Condition(self.lock)
+        self.task_ids = itertools.count()
+        self.tasks = {}
+        self.results = {}
+        # ids of tasks waiting for a worker, ones that are finished by now are skipped
+        self.pending = queue.Queue()
+        self.workers = 0
+        self.reassigned = 0
+        self.closing = threading.Event()
+
+        self.listener = Listener(address, authkey=authkey)
+        self.address = self.listener.address
+        self.handlers = []
+        self.accepter = threading.Thread(target=self.accept, daemon=True)
+        self.accepter.start()
+
+    # ------------------------------------------------------------------
+    # Coordinator threads, one accepting workers and one per worker
+
+    def accept(self):
+        while not self.closing.is_set():
+            try:
+                connection = self.listener.accept()
+            except (AuthenticationError, EOFError, ConnectionError) as error:
+                print(f"worker refused: {error}")
+                continue
+            except OSError:
+                return
+            if self.closing.is_set():
+                connection.close()
+                return
+
+            handler = threading.Thread(target=self.serve, args=(connection,), daemon=True)
+            with self.lock:
+                self.workers += 1
+                self.handlers.append(handler)
+            handler.start()
+
+    def serve(self, connection):
+        task_id = None
+        try:
+            connection.send(('setup', self.config_text, GameState.best_contract_mode, Timing.enabled, GameState.duplicate))
+            pool_generation = None
+            while not self.closing.is_set():
+                try:
+                    task_id = self.pending.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+
+                with self.lock:
+                    if task_id not in self.tasks:
+                        task_id = None
+                        continue
+                    genome1, genome2 = self.tasks[task_id]
+                    generation, deal_pool, ns_best = self.generation, self.deal_pool, self.ns_best
+
+                if pool_generation != generation:
+                    connection.send(('pool', generation, deal_pool, ns_best))
+                    pool_generation = generation
+                connection.send(('task', task_id, genome1, genome2))
+                self.wait_for_result(connection, task_id)
+                task_id = None
+
+            connection.send(('stop',))
+        except (EOFError, OSError) as error:
+            # the worker is gone, its task goes to another one
+            print(f"lost a worker: {error!r}")
+            if task_id is not None:
+                self.pending.put(task_id)
+        finally:
+            connection.close()
+            with self.lock:
+                self.workers -= 1
+
+    def wait_for_result(self, connection, task_id):
+        deadline = time.monotonic() + self.task_timeout
+        while not self.closing.is_set():
+            if connection.poll(0.1):
+                kind, result_id, averages, timings = connection.recv()
+                self.finish(result_id, averages, timings)
+                return
+
+            # too slow, let a free worker have it too, but take this answer if it comes first
+            if deadline is not None and time.monotonic() > deadline:
+                deadline = None
+                with self.lock:
+                    if task_id in self.tasks:
+                        self.reassigned += 1
+                        self.pending.put(task_id)
+
+    def finish(self, task_id, averages, timings):
+        with self.lock:
+            # late answers to a task already done are dropped
+            if task_id not in self.tasks:
+                return
+            del self.tasks[task_id]
+            self.results[task_id] = (averages, timings)
+            if not self.tasks:
+                self.finished.notify_all()
+
+    # ------------------------------------------------------------------
+
+    # evaluation function for neat.Population.run
+    def evaluate(self, genomes, config):
+        # the deals are solved once here, and sent to the workers with their tables
+        deal_pool = draw_deal_pool(self.trials, self.rng, self.corpus, self.pipeline)
+        ns_best = best_scores(deal_pool)
+        pool_id = deal_pool_id(deal_pool)
+
+        # genomes and pairs evaluated before keep their fitness, the workers play the others
+        pairs = fitness_cache.pairs(genomes, pool_id)
+        with self.lock:
+            self.deal_pool = deal_pool
+            self.ns_best = ns_best
+            ids = []
+            for (genome_id1, genome1), (genome_id2, genome2) in pairs:
+                task_id = next(self.task_ids)
+                self.tasks[task_id] = (genome1, genome2)
+                ids.append(task_id)
+                self.pending.put(task_id)
+
+            if self.tasks and self.workers == 0:
+                print(f"waiting for workers to connect to {self.address[0]}:{self.address[1]}")
+            while self.tasks:
+                self.finished.wait()
+            results = [self.results.pop(task_id) for task_id in ids]
+
+        for averages, timings in results:
+            Timing.merge(timings)
+
+        record_fitness(pairs, [averages for averages, timings in results], pool_id)
+        self.generation += 1
+
+    # stops the workers once they have answered their current task
+    def close(self):
+        self.closing.set()
+        # wake up the accepting thread with a connection of our own
+        try:
+            Client(self.address, authkey=self.authkey).close()
+        except OSError:
+            pass
+        self.accepter.join()
+        self.listener.close()
+        for handler in self.handlers:
+            handler.join()
+
+
+# ------------------------------------------------------------------
+# Workers
+
+# evaluate the tasks of the coordinator at address until it stops, returns the number of tasks done
+# the coordinator may not be up yet, it is tried for connect_timeout seconds
+# authkey defaults to the key of the environment, there has to be one
+def run_worker(address, authkey=None, connect_timeout=60.0):
+    if authkey is None:
+        authkey = environment_authkey()
+    if authkey is None:
+        raise ValueError("set NEAT_BIDDER_AUTHKEY to the key of the training run")
+
+    deadline = time.monotonic() + connect_timeout
+    while True:
+        try:
+            connection = Client(address, authkey=authkey)
+            break
+        except ConnectionRefusedError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(1.0)
+
+    tasks_done = 0
+    generation, deal_pool, ns_best = None, None, None
+    with connection:
+        while True:
+            try:
+                message = connection.recv()
+            except EOFError:
+                break
+
+            if message[0] == 'setup':
+                config_text, best_contract_mode, timing, duplicate = message[1:]
+                # neat reads its configuration from a file
+                with tempfile.NamedTemporaryFile('w', suffix='.cfg', delete=False) as f:
+                    f.write(config_text)
+                try:
+                    init_worker(f.name, best_contract_mode, timing, duplicate)
+                finally:
+                    os.remove(f.name)
+
+            elif message[0] == 'pool':
+                generation, deal_pool, ns_best = message[1:]
+
+            elif message[0] == 'task':
+                task_id, genome1, genome2 = message[1:]
+                averages, timings = evaluate_pair((genome1, genome2, deal_pool, ns_best, generation))
+                connection.send(('result', task_id, averages, timings))
+                tasks_done += 1
+
+            elif message[0] == 'stop':
+                break
+
+    return tasks_done
@@ -0,0 +1,241 @@
+import multiprocessing
+import neat
+import numpy as np
+from Deal import random_deal, vulnerabilities
+import DSS_adapter
+from DSS_adapter import solve_deals
+from BatchedAuction import BatchedAuction, best_scores
+from GameState import GameState
+from NumpyNetwork import network_cache
+from FitnessCache import fitness_cache, deal_pool_id
+from Timing import timed
+import Timing
+"""Playing the trial games of a genome pair, serially or spread over a pool of worker processes.
+
+Every pair in a generation plays the same deal pool, drawn and solved once per generation, so genomes
+are compared on identical boards. The pool is drawn from the evaluator's random generator, a seeded
+serial run and a seeded parallel run therefore play exactly the same games and give the same fitness.
+"""
+
+
+# draw the deals every pair plays in a generation, as (deal, vulnerable, dealer, table) records
+# from the corpus if there is one, else from the pipeline (a DealPipeline or PBNReader.DealStream) if there is one,
+# else they are dealt and solved here
+@timed('deal_pool')
+def draw_deal_pool(size, rng, corpus=None, pipeline=None):
+
+    if corpus is not None:
+        # take the deals from the pre-solved corpus
+        return [corpus.get(index) for index in rng.integers(len(corpus), size=size)]
+
+    if pipeline is not None:
+        # solved in the background while the last generation was played
+        return pipeline.take(size)
+
+    # deal and solve all deals in one batch
+    deals = [random_deal(rng) for _ in range(size)]
+    tables = solve_deals(deals)
+    return [(deal, vulnerabilities[rng.integers(4)], int(rng.integers(4)), table)
+            for deal, table in zip(deals, tables)]
+
+
+# play every deal of the pool between genome1 (N/S) and genome2 (E/W), returns the score of each game and seat
+# the games are bid in lockstep, with one forward pass per genome per round of bidding
+# in duplicate mode every deal is played again with the genomes swapped, and scored in IMPs between the tables
+# ns_best is best_scores of the deal pool, shared by all the pairs playing it, worked out here if it isn't given
+def play_scores(genome1, genome2, config, deal_pool, ns_best=None):
+    games = BatchedAuction(genome1, genome2, config, deal_pool, ns_best)
+    games.play()
+    if not GameState.duplicate:
+        return games.calculate_scores()
+
+    replay = BatchedAuction(genome2, genome1, config, deal_pool)
+    replay.play()
+    return games.duplicate_scores(replay)
+
+
+# the average score of each seat over the deal pool
+@timed('play_trials')
+def play_trials(genome1, genome2, config, deal_pool, ns_best=None):
+    # compute average difference from perfect play
+    return [float(score) for score in play_scores(genome1, genome2, config, deal_pool, ns_best).mean(axis=0)]
+
+
+# ------------------------------------------------------------------
+# Worker processes
+
+# set up once per worker by init_worker, libdds.so is loaded when a worker first needs the solver
+worker_state = {}
+
+def init_worker(config_path, best_contract_mode, timing, duplicate=False):
+    GameState.best_contract_mode = best_contract_mode
+    GameState.duplicate = duplicate
+    # the workers already use every core between them, each one solves on a single thread
+    DSS_adapter.set_max_threads(1)
+    Timing.enabled = timing
+    worker_state['config'] = neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction,
+                                                neat.DefaultSpeciesSet, neat.DefaultStagnation,
+                                                config_path)
+
+
+def evaluate_pair(task):
+    genome1, genome2, deal_pool, ns_best, generation = task
+    # a worker keeps its compiled networks until the parent moves on to the next generation
+    network_cache.start_generation(generation)
+
+    # the timings of this task go back to the parent with the scores
+    Timing.reset()
+    averages = play_trials(genome1, genome2, worker_state['config'], deal_pool, ns_best)
+    return averages, Timing.snapshot()
+
+
+# feed the averages each pair of genomes played on the deals of pool_id back to the fitness cache and
+# the genomes, at the end of a generation evaluated by any of the evaluators that use the fitness cache
+def record_fitness(pairs, results, pool_id):
+    for ((genome_id1, genome1), (genome_id2, genome2)), averages in zip(pairs, results):
+        fitness_cache.put(genome1, genome2, pool_id, averages)
+        print(f"average difference from best score: {averages[0]}")
+
+        # feedback the fitness to the genome
+        genome1.fitness, genome2.fitness = fitness_cache.fitness(genome1, genome2, averages)
+
+    fitness_cache.end_generation()
+
+
+class ParallelEvaluator:
+
+    def __init__(self, num_workers, config_path, trials, rng, corpus=None, pipeline=None):
+        self.trials = trials
+        self.rng = rng
+        self.corpus = corpus
+        self.pipeline = pipeline
+        # counts the calls to evaluate, so workers know when their cached networks are stale
+        self.generation = 0
+
+        # spawn fresh workers rather than forking, so no solver threads of the parent are copied
+        context = multiprocessing.get_context('spawn')
+        self.pool = context.Pool(num_workers, initializer=init_worker,
+                                 initargs=(config_path, GameState.best_contract_mode, Timing.enabled, GameState.duplicate))
+
+    # evaluation function for neat.Population.run
+    def evaluate(self, genomes, config):
+        # the deals are solved once here, and sent to the workers with their tables
+        deal_pool = draw_deal_pool(self.trials, self.rng, self.corpus, self.pipeline)
+        ns_best = best_scores(deal_pool)
+        pool_id = deal_pool_id(deal_pool)
+
+        # genomes and pairs evaluated before keep their fitness, the workers play the others
+        pairs = fitness_cache.pairs(genomes, pool_id)
+        tasks = [(genome1, genome2, deal_pool, ns_best, self.generation) for (genome_id1, genome1), (genome_id2, genome2) in pairs]
+
+        # results come back in the order of the tasks
+        results = self.pool.map(evaluate_pair, tasks)
+        for averages, timings in results:
+            Timing.merge(timings)
+
+        record_fitness(pairs, [averages for averages, timings in results], pool_id)
+        self.generation += 1
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+
+
+# ------------------------------------------------------------------
+# Racing
+
+# Evaluates the pairs of a generation with as few games as selection needs.
+# Every pair first plays batch_size deals. After that, genomes are compared to the fitness that separates
+# the survivors of the generation from the rest, estimated as the quantile of the current means at
+# 1 - survival_threshold over the whole population (NEAT applies the threshold per species). A pair
+# keeps playing batches while one of its genomes is within confidence standard errors of the threshold,
+# the closest pairs first, until it has played max_trials deals or the generation has used its budget.
+# Pairs that are clearly bad, or clearly good, stop early. By default max_trials is trials, so undecided
+# pairs play as many deals as without racing, raise it to give them more of the budget.
+# All pairs play the same deals in the same order. The pool is drawn and solved a batch at a time, when
+# the first pair needs it, so deals nobody plays are never solved.
+class RacingEvaluator:
+
+    # budget is in games per generation, by default the games of every pair playing trials deals
+    def __init__(self, trials, rng, corpus=None, pipeline=None, batch_size=4, max_trials=None, budget=None,
+                 confidence=2.0):
+        self.trials = trials
+        self.rng = rng
+        self.corpus = corpus
+        self.pipeline = pipeline
+        self.batch_size = batch_size
+        self.max_trials = max_trials or trials
+        self.budget = budget
+        self.confidence = confidence
+        # games and deals of the last generation
+        self.games = 0
+        self.deals = 0
+
+    # evaluation function for neat.Population.run
+    def evaluate(self, genomes, config):
+        # networks of the last generation are no longer needed
+        network_cache.clear()
+
+        pairs = list(zip(genomes[0::2], genomes[1::2]))
+        budget = self.budget or len(pairs) * self.trials
+        cut = 1 - config.reproduction_config.survival_threshold
+
+        deal_pool = []
+        ns_best = np.zeros(0)
+        # games played by each pair, sum and sum of squares of the scores of genome1 and genome2
+        played = np.zeros(len(pairs), dtype=int)
+        sums = np.zeros((len(pairs), 2))
+        squares = np.zeros((len(pairs), 2))
+
+        def play_batch(i):
+            (genome_id1, genome1), (genome_id2, genome2) = pairs[i]
+            start = played[i]
+            end = min(start + self.batch_size, self.max_trials)
+            nonlocal ns_best
+            while len(deal_pool) < end:
+                batch = draw_deal_pool(self.batch_size, self.rng, self.corpus, self.pipeline)
+                deal_pool.extend(batch)
+                ns_best = np.concatenate([ns_best, best_scores(batch)])
+
+            scores = play_scores(genome1, genome2, config, deal_pool[start:end], ns_best[start:end])[:, :2]
+            sums[i] += scores.sum(axis=0)
+            squares[i] += (scores ** 2).sum(axis=0)
+            played[i] = end
+            return end - start
+
+        games = sum(play_batch(i) for i in range(len(pairs)))
+        while games < budget:
+            n = played[:, None]
+            means = sums / n
+            variances = np.maximum(squares / n - means ** 2, 0.0) * n / np.maximum(n - 1, 1)
+
+            # a genome whose first few scores happen to agree would look certain, so none is taken to vary
+            # less than the variance pooled over all the genomes
+            weights = np.broadcast_to(n - 1, variances.shape)
+            pooled = (weights * variances).sum() / max(weights.sum(), 1)
+            errors = np.sqrt(np.maximum(variances, pooled) / n)
+
+            # standard errors from the threshold, a pair is as close as its closer genome
+            threshold = np.quantile(means, cut)
+            distance = (np.abs(means - threshold) / np.maximum(errors, 1e-9)).min(axis=1)
+            # a single deal says nothing about the variance, such a pair isn't decided yet
+            undecided = np.flatnonzero(((distance < self.confidence) | (played < 2)) & (played < self.max_trials))
+            if len(undecided) == 0:
+                break
+
+            for i in undecided[np.argsort(distance[undecided], kind='stable')]:
+                if games >= budget:
+                    break
+                games += play_batch(i)
+
+        means = sums / played[:, None]
+        for ((genome_id1, genome1), (genome_id2, genome2)), averages, deals in zip(pairs, means, played):
+            print(f"average difference from best score: {averages[0]} over {deals} deals")
+
+            # feedback the fitness to the genome
+            genome1.fitness = float(averages[0])
+            genome2.fitness = float(averages[1])
+
+        self.games = games
+        self.deals = len(deal_pool)
+        print(f"racing: {games} games of a budget of {budget}, on {self.deals} deals")
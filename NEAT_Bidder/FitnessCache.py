@@ -0,0 +1,149 @@
+import hashlib
+from collections import OrderedDict
+from GameState import GameState
+"""Fitness of genomes and genome pairs that were evaluated before, so they are not played again.
+
+Genomes are identified by a hash of their structure and weights, not their key, so a genome carried
+unchanged into the next generation by elitism is recognised, and so is an identical child. The hash is
+worked out once per genome and generation. An evaluation is identified by both genomes, the deals of
+the pool and the scoring mode, and is answered from the cache when all of them match.
+
+The pool of deals and the pairing are drawn again every generation, so an exact match is rare and an
+unchanged elite is still played with new deals and a new partner. With carry switched on it isn't: a
+genome evaluated in an earlier generation keeps the running average of all its evaluations as its
+fitness, and only the other genomes are paired and played.
+"""
+
+
+# hash of everything that makes a genome bid the way it does
+def genome_hash(genome):
+    nodes = sorted((key, node.bias, node.response, node.activation, node.aggregation)
+                   for key, node in genome.nodes.items())
+    connections = sorted((key, connection.weight, connection.enabled)
+                         for key, connection in genome.connections.items())
+    return hashlib.blake2b(repr((nodes, connections)).encode(), digest_size=16).hexdigest()
+
+
+# hash of the deals of a pool, with their vulnerability and dealer, and of how they are scored
+def deal_pool_id(deal_pool):
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr((GameState.best_contract_mode, GameState.duplicate)).encode())
+    for deal, vulnerable, dealer, table in deal_pool:
+        digest.update(deal.tobytes())
+        digest.update(repr((vulnerable, dealer)).encode())
+    return digest.hexdigest()
+
+
+class FitnessCache:
+
+    # keeps the averages of up to max_entries evaluations, with carry the running averages of the genomes too
+    def __init__(self, carry=False, max_entries=100000):
+        self.carry = carry
+        self.max_entries = max_entries
+        self.evaluations = OrderedDict()
+        # sum and count of the fitness of every genome hash, for carry
+        self.running = {}
+        # hashes of the genomes of the current generation, by genome key
+        self.hashes = {}
+
+        # counts of the current generation
+        self.pairs_played = 0
+        self.pairs_cached = 0
+        self.genomes_carried = 0
+
+    # the hash of a genome, worked out once a generation
+    # a genome key is only reused by an elite, which is unchanged, so a hash is never stale
+    def hash(self, genome):
+        digest = self.hashes.get(genome.key)
+        if digest is None:
+            digest = self.hashes[genome.key] = genome_hash(genome)
+        return digest
+
+    # the pairs of the generation to play on the deals of pool_id, pairs evaluated on them before get
+    # their fitness from the cache and are left out
+    # with carry the genomes evaluated before get their running average as fitness and are left out too,
+    # except one if needed to make up the last pair
+    def pairs(self, genomes, pool_id):
+        if self.carry:
+            known = []
+            unknown = []
+            for genome_id, genome in genomes:
+                running = self.running.get(self.hash(genome))
+                if running is None:
+                    unknown.append((genome_id, genome))
+                else:
+                    genome.fitness = running[0] / running[1]
+                    known.append((genome_id, genome))
+            if len(unknown) % 2 == 1 and known:
+                unknown.append(known.pop(0))
+            self.genomes_carried += len(known)
+            genomes = unknown
+
+        pairs = []
+        for (genome_id1, genome1), (genome_id2, genome2) in zip(genomes[0::2], genomes[1::2]):
+            key = (self.hash(genome1), self.hash(genome2), pool_id)
+            averages = self.evaluations.get(key)
+            if averages is None:
+                pairs.append(((genome_id1, genome1), (genome_id2, genome2)))
+            else:
+                self.evaluations.move_to_end(key)
+                self.pairs_cached += 1
+                genome1.fitness, genome2.fitness = self.fitness(genome1, genome2, averages)
+        return pairs
+
+    # store the averages of a pair that was played on the deals of pool_id, with carry add them to the
+    # running averages of the genomes
+    def put(self, genome1, genome2, pool_id, averages):
+        self.pairs_played += 1
+        self.evaluations[(self.hash(genome1), self.hash(genome2), pool_id)] = averages
+        if len(self.evaluations) > self.max_entries:
+            self.evaluations.popitem(last=False)
+
+        if not self.carry:
+            return
+        for genome, average in [(genome1, averages[0]), (genome2, averages[1])]:
+            running = self.running.setdefault(self.hash(genome), [0.0, 0])
+            running[0] += average
+            running[1] += 1
+
+    # the fitness of both genomes after an evaluation, with carry their running averages
+    def fitness(self, genome1, genome2, averages):
+        if not self.carry:
+            return averages[0], averages[1]
+
+        fitness = []
+        for genome, average in [(genome1, averages[0]), (genome2, averages[1])]:
+            running = self.running.get(self.hash(genome))
+            fitness.append(average if running is None else running[0] / running[1])
+        return tuple(fitness)
+
+    # print how many pairs were played and reused in the generation, and start counting the next one
+    def end_generation(self):
+        line = f"fitness cache: {self.pairs_played} pairs played, {self.pairs_cached} reused"
+        if self.carry:
+            line += f", {self.genomes_carried} genomes carried"
+        print(line)
+        self.pairs_played = 0
+        self.pairs_cached = 0
+        self.genomes_carried = 0
+        self.hashes.clear()
+
+    def stats(self):
+        return {'pairs_played': self.pairs_played, 'pairs_cached': self.pairs_cached,
+                'genomes_carried': self.genomes_carried, 'size': len(self.evaluations), 'genomes': len(self.running)}
+
+    def clear(self):
+        self.evaluations.clear()
+        self.running.clear()
+        self.hashes.clear()
+
+    # for checkpoints, so a resumed run reuses and carries the same averages
+    def get_state(self):
+        return {'evaluations': self.evaluations, 'running': self.running}
+
+    def set_state(self, state):
+        self.evaluations = OrderedDict(state.get('evaluations', {}))
+        self.running = state['running']
+
+
+fitness_cache = FitnessCache()
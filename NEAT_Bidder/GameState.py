@@ -1,42 +1,74 @@
-import random
-from DSS_adapter import return_best_contract
-from Deal import random_deal
+from DSS_adapter import return_best_contract, store_results
+from Deal import random_deal, default_rng, vulnerabilities, hand_to_strings
 from BidBot import BidBot
+from Auction import Auction
+from Scoring import imps
+from Timing import timed
 
 
 class GameState:
 
+    # a game is reset for every deal instead of being made again, see reset
+    __slots__ = ('genome1', 'genome2', 'config', 'auction', 'bots', 'scores', 'deal', 'dealer', 'next_player', 'vulnerable',
+                 'mirror')
+
     players = ['N', 'E', 'S', 'W']
 
-    def __init__(self, genome1, genome2, config):
+    # how the ideal score is found: 'max' for the best makeable contract, 'par' for the par contract
+    best_contract_mode = 'max'
+
+    # score boards as duplicate: every deal is played again with the genomes swapping sides, and each genome
+    # scores the IMPs its side won against the other table, see duplicate_scores
+    duplicate = False
+
+    def __init__(self, genome1, genome2, config, deal=None, vulnerable=None, dealer=None, rng=default_rng):
 
-        # Variables for bot NN
-        self.genome1 = genome1
-        self.genome2 = genome2
         self.config = config
 
-        # Initialize game state variables
-        self.previous_bids = []
+        # Initialize game state variables, the bots read the bidding from the shared auction
+        self.auction = Auction()
         self.bots = []
-        self.scores = []
+        # the game of the other table for duplicate, made by the first call to swapped
+        self.mirror = None
+
+        self.reset(deal, vulnerable, dealer, (genome1, genome2), rng)
+
+    # start a new game, reusing the auction and the bots with their buffers
+    # genomes is (genome1, genome2), None keeps the genomes of the last game
+    def reset(self, deal=None, vulnerable=None, dealer=None, genomes=None, rng=default_rng):
 
+        # Variables for bot NN
+        if genomes is not None:
+            self.genome1, self.genome2 = genomes
+
+        self.auction.reset()
+        # a new list, the scores of the last game may still be held by the caller
+        self.scores = []
 
-        self.deal = random_deal()
+        # use the given deal (e.g. one that is already solved), or deal a new one
+        if deal is None:
+            deal = random_deal(rng)
+        self.deal = deal
 
         # pre-solved deal for testing
 
-        # self.deal = {'N': ['7S', '4S', '2S', '9H', '5H', '2H', '5D', '3D', 'KC', 'JC','10C', '9C', '5C'],
+        # self.deal = deal_from_strings({'N': ['7S', '4S', '2S', '9H', '5H', '2H', '5D', '3D', 'KC', 'JC','10C', '9C', '5C'],
         #      'E': ['9S', '5S', '3S', 'AH', 'KH', '8H', '7H', 'JD', '9D', '7D', '2D', '7C', '4C'],
         #      'S': ['KS', 'JS', '10S', 'QH', 'JH', '6H', 'KD', 'QD', '8D', 'AC', 'QC', '8C', '2C'],
-        #      'W': ['AS', 'QS', '8S', '6S', '10H', '4H', '3H', 'AD', '10D', '6D', '4D', '6C', '3C']}
+        #      'W': ['AS', 'QS', '8S', '6S', '10H', '4H', '3H', 'AD', '10D', '6D', '4D', '6C', '3C']})
         
-        self.next_player = random.randint(0, 3)
+        if dealer is None:
+            dealer = int(rng.integers(4))
+        self.dealer = dealer
+        self.next_player = dealer
 
-        self.vulnerable = random.choice(['none', 'N/S', 'E/W', 'BOTH'])
+        if vulnerable is None:
+            vulnerable = vulnerabilities[rng.integers(4)]
+        self.vulnerable = vulnerable
 
 
         # N, S bots get Genome1, E, W bots get Genome2
-        for Player in self.deal:
+        for i, Player in enumerate(self.players):
             if Player in ['N', 'S']:
                 
                 genome = self.genome1
@@ -44,24 +76,40 @@ class GameState:
                 
                 genome = self.genome2
 
-            self.register_bot(BidBot(Player, self.vulnerable, self.deal[Player], genome, self.config))
+            if len(self.bots) < len(self.players):
+                self.register_bot(BidBot(Player, self.vulnerable, self.deal[i], genome, self.config, self.auction))
+            else:
+                self.bots[i].reset(self.vulnerable, self.deal[i], genome, self.config)
+
+
+    # start a game on a deal from a pre-solved DealCorpus, its table is put in the cache so it is never solved again
+    @classmethod
+    def from_corpus(cls, genome1, genome2, config, corpus, index):
+        deal, vulnerable, dealer, table = corpus.get(index)
+        store_results(deal, table)
+        return cls(genome1, genome2, config, deal, vulnerable, dealer)
+
+    # start a game on the next deal of a DealPipeline, its table is put in the cache so it is never solved again
+    @classmethod
+    def from_pipeline(cls, genome1, genome2, config, pipeline):
+        deal, vulnerable, dealer, table = pipeline.get()
+        store_results(deal, table)
+        return cls(genome1, genome2, config, deal, vulnerable, dealer)
 
-    
     # 
+    @timed('bidding')
     def add_bid(self):
         # promt next player for a bid
-        player = self.players[self.next_player]
-        bid = self.bots[self.next_player].choose_bid()
+        bid = self.bots[self.next_player].choose_bid_index()
 
-        # add bid to bids and get new next player
-        player_and_bid = [player,bid]
-        self.previous_bids.append(player_and_bid)
-        # next player is:
-        self.next_player = (self.next_player + 1) % 4
+        # add bid to the auction the bots share
+        self.auction.add_bid(self.next_player, bid)
 
-        # Update the state in the bots
+        # Update the input of the bots' nets
         for BidBot in self.bots:
-            BidBot.update_previous_bids(player_and_bid)
+            BidBot.update_previous_bids(self.next_player, bid)
+        # next player is:
+        self.next_player = (self.next_player + 1) % 4
     
 
     def register_bot(self, BidBot):
@@ -69,25 +117,18 @@ class GameState:
 
     # how many PASS bids have occurred
     def pass_count(self):
-        bids = self.previous_bids
-        if len(bids) > 0:
-            count = 0
-            index = len(bids) - 1
-            while bids[index][1] == 'PASS' and index >= 0:
-                index -= 1
-                count += 1
-            return count
-        return 0
+        return self.auction.passes
     
     # 3 passes in a row ends the game
     def bidding_is_finished(self):
-        return len(self.previous_bids) > 3 and self.pass_count() >= 3
+        return self.auction.is_finished()
     
 
     # compare each bot to the score associated with ideal play 
+    @timed('scoring')
     def calculate_scores(self):
 
-        best_team, best_contract , best_score = return_best_contract(self.deal, self.vulnerable)
+        best_team, best_contract , best_score = return_best_contract(self.deal, self.vulnerable, self.dealer, self.best_contract_mode)
         # print(f"best: {best_contract} for {best_score}")
 
         for BidBot in self.bots:
@@ -108,29 +149,29 @@ class GameState:
 
         return self.scores     
 
-    # finds player and bid from the previous bids
-    def get_last_bid(self):
-        
-        # Move down the list of bids until a bid that isnt PASS, X or XX
-        index = len(self.previous_bids) - 1
-        while self.previous_bids[index][1] in ['PASS','X','XX'] and index >= 0:
-            index -= 1
-
-        last_player = self.previous_bids[index][0]
-        last_contract = self.previous_bids[index][1]
-
-        # Move down the list to find the last actual bid
-        index = len(self.previous_bids) - 1
-        while self.previous_bids[index][1] == 'PASS' and index >= 0:
-            index -= 1
-
-        last_bid = self.previous_bids[index][1]
-        if last_bid in ['X','XX']:
-            doubled = last_bid
+    # N/S score of the contract played, passed out games score 0
+    def ns_score(self):
+        return self.bots[0].get_score(self.deal)
+
+    # the same board with genome2 sitting N/S and genome1 E/W, the deal's table is already in the cache
+    # the same swapped game is reset for every board, it is only valid until the next call
+    def swapped(self):
+        if self.mirror is None:
+            self.mirror = GameState(self.genome2, self.genome1, self.config, self.deal, self.vulnerable, self.dealer)
         else:
-            doubled = 'N'
+            self.mirror.reset(self.deal, self.vulnerable, self.dealer, (self.genome2, self.genome1))
+        return self.mirror
 
-        return last_player, last_contract, doubled
+    # IMPs of each seat against the other table of a duplicate board, replay is the finished swapped game
+    # every seat is compared to the seat that held the same cards, so the luck of the deal cancels out
+    @timed('scoring')
+    def duplicate_scores(self, replay):
+        genome1_imps = int(imps(self.ns_score() - replay.ns_score()))
+        return [genome1_imps, -genome1_imps, genome1_imps, -genome1_imps]
+
+    # finds player and bid from the previous bids
+    def get_last_bid(self):
+        return self.auction.get_last_bid()
 
     # getters and setters for testing   
     def get_next_player(self):
@@ -140,7 +181,7 @@ class GameState:
         return self.vulnerable
     
     def get_previous_bids(self):
-        return self.previous_bids
+        return self.auction.get_previous_bids()
     
     def set_deal(self, deal):
         self.deal = deal
@@ -151,13 +192,13 @@ class GameState:
 
     
     def print_hands(self):
-        for Player in self.deal:
-            print(f"{Player}: {self.deal[Player]}")
+        for i, Player in enumerate(self.players):
+            print(f"{Player}: {hand_to_strings(self.deal[i])}")
 
 
     # for printing final scores in a game
     def print_scores(self):
-        best_team, best_contract , best_score = return_best_contract(self.deal, self.vulnerable)
+        best_team, best_contract , best_score = return_best_contract(self.deal, self.vulnerable, self.dealer, self.best_contract_mode)
         print(f"best: {best_contract} by {best_team} for {best_score}")
 
         # print actual last played contract
@@ -1,70 +1,160 @@
 from Deal import print_deal
+from DealCorpus import DealCorpus
+from Evaluation import draw_deal_pool, play_trials, record_fitness, ParallelEvaluator, RacingEvaluator
+from BatchedAuction import best_scores
+import argparse
 import neat
 import numpy as np
 import pickle
 import os
+import random
+import sys
 from GameState import GameState
+from NumpyNetwork import network_cache
+from FitnessCache import fitness_cache, deal_pool_id
+from Timing import TimingReporter
+from Checkpoint import Checkpointer, restore_checkpoint
+from DealPipeline import DealPipeline
+from PBNReader import DealStream
+from Distributed import Coordinator, environment_authkey, parse_address, run_worker
+
+
+# deals in the pool played by every genome pair in a generation
+trials = 20
+
+# generations of a training run
+generations_total = 100
+
+# the deal pools are drawn from this numpy random Generator, seed it to make training reproducible
+eval_rng = np.random.default_rng()
 
 
 # Use the genome to bid
 def eval_genomes(genomes, config):
+
+    # networks of the last generation are no longer needed
+    network_cache.clear()
+
+    # every pair plays the same deals, solved once for the whole generation
+    deal_pool = draw_deal_pool(trials, eval_rng, corpus, pipeline)
+    ns_best = best_scores(deal_pool)
+    pool_id = deal_pool_id(deal_pool)
     
-    for (genome_id1, genome1), (genome_id2, genome2) in zip(genomes[0::2], genomes[1::2]):
+    # genomes and pairs evaluated before keep their fitness, the others are played
+    pairs = fitness_cache.pairs(genomes, pool_id)
+
+    # compute average difference from perfect play
+    results = [play_trials(genome1, genome2, config, deal_pool, ns_best)
+               for (genome_id1, genome1), (genome_id2, genome2) in pairs]
+    record_fitness(pairs, results, pool_id)
+
         
-        trials = 20
-        sums = [0,0,0,0]
 
-        for _ in range(trials):
-            # start a game with 2 genome 
 
-            game = GameState(genome1, genome2, config)
 
-            # play the game
-            while game.bidding_is_finished() == False:
-                game.add_bid()
+# Configuration file, next to this file unless another path is given
+default_config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config-feedforward")
 
-            score = game.calculate_scores()
-            for i in range(4):
-                sums[i] += score[i]
-        
-        # compute average difference from perfect play
-        averages = [s / trials for s in sums]
-        print(f"average difference from best score: {averages[0]}")
+# Pre-solved training deals, generated by DealCorpus.py. Without it deals are dealt and solved during training
+default_corpus_path = "deals.bin"
+corpus = None
 
-        # feedback the fitness to the genome
-        genome1.fitness = averages[0]
-        genome2.fitness = averages[1]
+# Without a corpus the deals can be solved by background threads instead, or read from a file, see run_neat
+pipeline = None
 
-        
+# where the winner of training is saved
+genome_path = "best_genome.pkl"
+
+
+def load_config(config_path=default_config_path):
+    return neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction,
+                              neat.DefaultSpeciesSet, neat.DefaultStagnation,
+                              config_path)
 
+# returns None if there is no corpus at the path
+def load_corpus(corpus_path=default_corpus_path):
+    return DealCorpus(corpus_path) if os.path.exists(corpus_path) else None
 
+# workers > 1 spreads the genome pairs over that many processes
+# timing_path is a file for the per generation timings, as JSON lines, profile_generations are run under cProfile
+# the population is checkpointed every checkpoint_interval generations, resume is a checkpoint file to carry on from
+# without a corpus, producers > 0 threads solve the deal pools in the background, keeping queue_depth deals ready
+# listen is a (host, port) address for workers on other machines to connect to, instead of local workers
+# racing plays fewer games with pairs that are clearly in or out, the others up to racing_max_trials deals
+# and up to racing_budget games per generation
+# carry_fitness keeps the running average fitness of genomes evaluated before instead of playing them again,
+# racing plays every genome and doesn't use it
+# deals_path is a file of deals to train on instead, in PBN or the format of the DDS test files, see PBNReader.py
+def run_neat(config_path=default_config_path, workers=1, seed=None, timing_path=None, profile_generations=(),
+             checkpoint_interval=5, resume=None, corpus_path=default_corpus_path, producers=0, queue_depth=None,
+             listen=None, task_timeout=120.0, racing=False, racing_max_trials=None, racing_budget=None,
+             carry_fitness=False, deals_path=None):
+    global eval_rng, corpus, pipeline
+    random.seed(seed)
+    eval_rng = np.random.default_rng(seed)
+    config = load_config(config_path)
+    corpus = load_corpus(corpus_path) if deals_path is None else None
+    fitness_cache.clear()
+    fitness_cache.carry = carry_fitness
 
-# Load the configuration file
-config_path = "config-feedforward"
-config = neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction,
-                            neat.DefaultSpeciesSet, neat.DefaultStagnation,
-                            config_path)
+    # Create the population, or restore it with the random states it had
+    deals_state = None
+    if resume is not None:
+        population, deals_state = restore_checkpoint(resume, config, eval_rng)
+        print(f"Resuming at generation {population.generation}")
+    else:
+        population = neat.Population(config)
 
-def run_neat():
-    # Create the population
-    population = neat.Population(config)
+    # Start solving the deals of the first generations, or reading them from the file
+    if deals_path is not None:
+        pipeline = DealStream(deals_path, state=deals_state)
+    elif producers > 0 and corpus is None:
+        pipeline = DealPipeline(eval_rng, producers, queue_depth or 4 * trials, state=deals_state)
 
     # Add a reporter 
     population.add_reporter(neat.StdOutReporter(True))
     stats = neat.StatisticsReporter()
     population.add_reporter(stats)
+    if timing_path is not None:
+        population.add_reporter(TimingReporter(timing_path, profile_generations))
+    checkpointer = Checkpointer(population, eval_rng, checkpoint_interval, deals=pipeline)
+    if checkpoint_interval > 0:
+        population.add_reporter(checkpointer)
 
-    # Run the NEAT algorithm
-    winner = population.run(eval_genomes, 100)
+    # Run the NEAT algorithm, up to generation 100 in total
+    generations = generations_total - population.generation
+    try:
+        if listen is not None or workers > 1:
+            if listen is not None:
+                evaluator = Coordinator(config_path, trials, eval_rng, listen, corpus, pipeline, task_timeout)
+            else:
+                evaluator = ParallelEvaluator(workers, config_path, trials, eval_rng, corpus, pipeline)
+            try:
+                winner = population.run(evaluator.evaluate, generations)
+            finally:
+                evaluator.close()
+        elif racing:
+            evaluator = RacingEvaluator(trials, eval_rng, corpus, pipeline, max_trials=racing_max_trials,
+                                        budget=racing_budget)
+            winner = population.run(evaluator.evaluate, generations)
+        else:
+            winner = population.run(eval_genomes, generations)
+    finally:
+        # let the last checkpoint finish writing
+        checkpointer.close()
+        if pipeline is not None:
+            pipeline.close()
+            print(f"Deals: {pipeline.stats()}")
+            pipeline = None
 
     # Save the winning genome
-    with open('best_genome.pkl', 'wb') as f:
+    with open(genome_path, 'wb') as f:
         pickle.dump(winner, f)
 
     return winner
 
-def load_winner():
-    with open('best_genome.pkl', 'rb') as f:
+def load_winner(path=genome_path):
+    with open(path, 'rb') as f:
         winner = pickle.load(f)
     return winner
 
@@ -89,16 +179,117 @@ def play_game_with_winner(winner, config):
     game_state.print_scores()
 
 
-# Check if a saved genome exists
-if os.path.exists('best_genome.pkl'):
-    print("Loading saved genome...")
-    winner = load_winner()
-else:
-    print("Training new genome...")
-    winner = run_neat()
+# play a number of deals with the genome in every seat, returns the average difference from the best score
+# deals_path is a file to take the deals from, instead of dealing them or taking them from the corpus
+def evaluate_winner(winner, config, games, seed=None, corpus_path=default_corpus_path, deals_path=None):
+    if deals_path is not None:
+        deals = DealStream(deals_path)
+        deal_pool = deals.take(games)
+        deals.close()
+    else:
+        deal_pool = draw_deal_pool(games, np.random.default_rng(seed), load_corpus(corpus_path))
+    return play_trials(winner, winner, config, deal_pool)[0]
+
+
+commands = ['train', 'play', 'evaluate', 'worker', 'benchmark']
+
+def main(argv=None):
+    global trials
+    argv = sys.argv[1:] if argv is None else list(argv)
+
+    # without a command: play the saved genome, or train one first, like before there were commands
+    if not any(arg in commands for arg in argv):
+        train_first = '--resume' in argv or not os.path.exists(genome_path)
+        argv = ['train' if train_first else 'play'] + argv
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--config', default=default_config_path, help="NEAT configuration file")
+    common.add_argument('--par', action='store_true', help="score the bots against the par contract")
+
+    parser = argparse.ArgumentParser(description="Train, play or evaluate the NEAT bridge bidder")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    train = subparsers.add_parser('train', parents=[common], help="train a genome, then play a game with it")
+    train.add_argument('--workers', type=int, default=1, help="processes used to evaluate genomes")
+    train.add_argument('--seed', type=int, default=None, help="seed for the training games")
+    train.add_argument('--corpus', default=default_corpus_path, help="pre-solved deals made by DealCorpus.py")
+    train.add_argument('--deals', help="PBN file or DDS test file of deals to train on, instead of the corpus")
+    train.add_argument('--trials', type=int, default=trials, help="deals played by every genome pair in a generation")
+    train.add_argument('--duplicate', action='store_true', help="play every deal twice with the pairs swapping sides, scored in IMPs")
+    train.add_argument('--carry-fitness', action='store_true',
+                       help="don't play genomes evaluated before, keep their running average")
+    train.add_argument('--producers', type=int, default=0, help="threads solving deals in the background, without a corpus")
+    train.add_argument('--queue-depth', type=int, default=None, help="solved deals kept ready by the producers")
+    train.add_argument('--listen', type=parse_address, help="host:port to evaluate on workers started with the worker command")
+    train.add_argument('--task-timeout', type=float, default=120.0, help="seconds before a task of a worker is given to another")
+    train.add_argument('--racing', action='store_true', help="stop playing pairs once they are clearly in or out of selection")
+    train.add_argument('--racing-max-trials', type=int, default=None, help="deals a close pair may play with --racing")
+    train.add_argument('--racing-budget', type=int, default=None, help="games per generation with --racing")
+    train.add_argument('--timing', help="write a timing breakdown of every generation to this file")
+    train.add_argument('--profile', type=int, nargs='*', default=[], help="generations to profile, needs --timing")
+    train.add_argument('--checkpoint', type=int, default=5, help="generations between checkpoints, 0 for none")
+    train.add_argument('--resume', help="checkpoint file to continue training from")
+
+    play = subparsers.add_parser('play', parents=[common], help="play a game with the saved genome")
+    play.add_argument('--genome', default=genome_path, help="saved genome")
+
+    evaluate = subparsers.add_parser('evaluate', parents=[common], help="score the saved genome over many deals")
+    evaluate.add_argument('--genome', default=genome_path, help="saved genome")
+    evaluate.add_argument('--games', type=int, default=100, help="number of deals")
+    evaluate.add_argument('--seed', type=int, default=None, help="seed for the deals")
+    evaluate.add_argument('--corpus', default=default_corpus_path, help="pre-solved deals made by DealCorpus.py")
+    evaluate.add_argument('--deals', help="PBN file or DDS test file to take the deals from, in order")
+
+    # the configuration and deals come from the training run
+    worker = subparsers.add_parser('worker', help="evaluate genomes for a training run started with --listen")
+    worker.add_argument('--connect', type=parse_address, required=True, help="host:port the training run listens on")
+    worker.add_argument('--connect-timeout', type=float, default=60.0, help="seconds to keep trying to connect")
+
+    # the options of the benchmark are those of Benchmark.py
+    subparsers.add_parser('benchmark', add_help=False, help="run Benchmark.py, see Benchmark.py --help")
+
+    args, extra = parser.parse_known_args(argv)
+    if args.command == 'benchmark':
+        import Benchmark
+        return Benchmark.main(extra)
+    if extra:
+        parser.error(f"unrecognized arguments: {' '.join(extra)}")
+
+    if args.command == 'worker':
+        if environment_authkey() is None:
+            parser.error("set NEAT_BIDDER_AUTHKEY to the key of the training run, it prints one if it has none")
+        tasks_done = run_worker(args.connect, connect_timeout=args.connect_timeout)
+        print(f"worker done after {tasks_done} tasks")
+        return 0
+
+    if args.par:
+        GameState.best_contract_mode = 'par'
+    config = load_config(args.config)
+
+    if args.command == 'train' and args.racing and (args.workers > 1 or args.listen is not None):
+        parser.error("--racing evaluates in this process, it can't be used with --workers or --listen")
+    if args.command == 'train' and args.racing and args.carry_fitness:
+        parser.error("--racing plays every genome, it can't be used with --carry-fitness")
+
+    if args.command == 'train':
+        trials = args.trials
+        GameState.duplicate = args.duplicate
+        print("Training new genome...")
+        winner = run_neat(args.config, args.workers, args.seed, args.timing, args.profile,
+                          args.checkpoint, args.resume, args.corpus, args.producers, args.queue_depth,
+                          args.listen, args.task_timeout, args.racing, args.racing_max_trials,
+                          args.racing_budget, args.carry_fitness, args.deals)
+        print("Playing game with winning genome...")
+        play_game_with_winner(winner, config)
+
+    elif args.command == 'play':
+        print("Loading saved genome...")
+        play_game_with_winner(load_winner(args.genome), config)
 
-# Create the neural network from the winning genome
-print("Playing game with winning genome...")
+    elif args.command == 'evaluate':
+        score = evaluate_winner(load_winner(args.genome), config, args.games, args.seed, args.corpus, args.deals)
+        print(f"average difference from best score over {args.games} deals: {score}")
 
-play_game_with_winner(winner, config)
 
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,145 @@
+import numpy as np
+from neat.graphs import feed_forward_layers
+from Timing import timed
+"""A NumPy version of neat.nn.FeedForwardNetwork.
+
+A genome is compiled into one dense weight matrix per layer of the topological order neat-python
+computes, so a forward pass is a few matrix products instead of a Python loop over every
+connection. A whole batch of input vectors can be evaluated in one call, and the results match
+FeedForwardNetwork.activate within float tolerance.
+"""
+
+# NumPy versions of the neat-python activation functions
+activations = {
+    'sigmoid': lambda z: 1.0 / (1.0 + np.exp(-np.clip(5.0 * z, -60.0, 60.0))),
+    'tanh': lambda z: np.tanh(np.clip(2.5 * z, -60.0, 60.0)),
+    'sin': lambda z: np.sin(np.clip(5.0 * z, -60.0, 60.0)),
+    'gauss': lambda z: np.exp(-5.0 * np.clip(z, -3.4, 3.4) ** 2),
+    'relu': lambda z: np.maximum(z, 0.0),
+    'softplus': lambda z: 0.2 * np.log(1 + np.exp(np.clip(5.0 * z, -60.0, 60.0))),
+    'identity': lambda z: z,
+    'clamped': lambda z: np.clip(z, -1.0, 1.0),
+    'exp': lambda z: np.exp(np.clip(z, -60.0, 60.0)),
+    'abs': lambda z: np.abs(z),
+    'hat': lambda z: np.maximum(0.0, 1 - np.abs(z)),
+    'square': lambda z: z ** 2,
+    'cube': lambda z: z ** 3,
+}
+
+
+class NumpyFeedForwardNetwork:
+
+    def __init__(self, num_inputs, num_values, output_index, layers):
+        self.num_inputs = num_inputs
+        self.num_values = num_values
+        # position of each output node in the value array
+        self.output_index = output_index
+        # each layer is (value positions, weights, bias, response, [(activation, columns)])
+        self.layers = layers
+
+    def activate(self, inputs):
+        if len(inputs) != self.num_inputs:
+            raise RuntimeError("Expected {0:n} inputs, got {1:n}".format(self.num_inputs, len(inputs)))
+
+        return self.activate_batch(np.asarray(inputs, dtype=np.float64)[np.newaxis, :])[0]
+
+    # evaluate a (batch, num_inputs) array of inputs, returns a (batch, num_outputs) array
+    @timed('activation')
+    def activate_batch(self, inputs):
+        values = np.zeros((len(inputs), self.num_values))
+        values[:, :self.num_inputs] = inputs
+
+        for positions, weights, bias, response, groups in self.layers:
+            z = bias + response * (values @ weights)
+            for activation, columns in groups:
+                values[:, positions[columns]] = activation(z[:, columns])
+
+        return values[:, self.output_index]
+
+    @staticmethod
+    @timed('network_create')
+    def create(genome, config):
+        """ Receives a genome and returns its phenotype (a NumpyFeedForwardNetwork). """
+        genome_config = config.genome_config
+
+        # Gather expressed connections.
+        connections = [cg.key for cg in genome.connections.values() if cg.enabled]
+        layers = feed_forward_layers(genome_config.input_keys, genome_config.output_keys, connections)
+
+        # the value array holds the inputs, then the nodes in evaluation order
+        # outputs that are not connected to anything keep the value 0, like in FeedForwardNetwork
+        index = {key: i for i, key in enumerate(genome_config.input_keys)}
+        for layer in layers:
+            for node in sorted(layer):
+                index[node] = len(index)
+        for node in genome_config.output_keys:
+            if node not in index:
+                index[node] = len(index)
+
+        compiled = []
+        for layer in layers:
+            nodes = sorted(layer)
+            column = {node: i for i, node in enumerate(nodes)}
+            weights = np.zeros((len(index), len(nodes)))
+            for conn_key in connections:
+                inode, onode = conn_key
+                if onode in column:
+                    weights[index[inode], column[onode]] = genome.connections[conn_key].weight
+
+            bias = np.array([genome.nodes[node].bias for node in nodes])
+            response = np.array([genome.nodes[node].response for node in nodes])
+
+            # nodes of a layer are grouped by activation function
+            groups = {}
+            for i, node in enumerate(nodes):
+                ng = genome.nodes[node]
+                if ng.aggregation != 'sum':
+                    raise ValueError(f"Unsupported aggregation function: {ng.aggregation}")
+                if ng.activation not in activations:
+                    raise ValueError(f"Unsupported activation function: {ng.activation}")
+                groups.setdefault(ng.activation, []).append(i)
+
+            groups = [(activations[name], np.array(columns)) for name, columns in groups.items()]
+            positions = np.array([index[node] for node in nodes])
+            compiled.append((positions, weights, bias, response, groups))
+
+        output_index = np.array([index[node] for node in genome_config.output_keys])
+        return NumpyFeedForwardNetwork(len(genome_config.input_keys), len(index), output_index, compiled)
+
+
+# compiled networks of the genomes being evaluated, keyed by genome key
+# genomes don't change while a generation is evaluated, so each one is compiled once however many games it plays
+class NetworkCache:
+
+    def __init__(self):
+        self.networks = {}
+        self.generation = None
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, genome, config):
+        net = self.networks.get(genome.key)
+        if net is None:
+            self.misses += 1
+            net = NumpyFeedForwardNetwork.create(genome, config)
+            self.networks[genome.key] = net
+        else:
+            self.hits += 1
+        return net
+
+    # drop the networks of the last generation when a new one starts
+    def start_generation(self, generation):
+        if generation != self.generation:
+            self.clear()
+            self.generation = generation
+
+    def clear(self):
+        self.networks.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self.networks)}
+
+
+network_cache = NetworkCache()
@@ -0,0 +1,213 @@
+import numpy as np
+from Deal import players
+from DSS_adapter import solve_deals, store_results, store_par, par_vulnerability, MAXNOOFTABLES
+"""Streaming reader of deal files, turning them into (deal, vulnerable, dealer, table) records for training.
+
+Two formats are read:
+
+- the DDS test files in dds/hands, such as list100.txt, with a PBN line per deal followed by TABLE and
+  PAR lines holding its solved tricks and par contracts
+- PBN archives of real deals, with [Deal], [Dealer] and [Vulnerable] tags, and the tricks of the
+  [OptimumResultTable] section when the archive has been double dummy analysed
+
+Files are read a line at a time, so memory doesn't grow with the size of the file. When a deal comes
+with its table and par, they are put in the solver's caches and the deal is never solved, deals
+without a table are solved in batches.
+
+    python3 NEAT_bidder.py train --deals tournament.pbn
+    python3 NEAT_bidder.py evaluate --deals dds/hands/list1000.txt --games 1000
+"""
+
+# DDS vulnerability codes used by the test files, to the names in Deal.py
+dds_vulnerabilities = {code: name for name, code in par_vulnerability.items()}
+
+# values of the PBN Vulnerable tag
+pbn_vulnerabilities = {'None': 'none', 'Love': 'none', '-': 'none', 'NS': 'N/S', 'EW': 'E/W', 'All': 'BOTH', 'Both': 'BOTH'}
+
+pbn_ranks = 'AKQJT98765432'
+pbn_seats = 'NESW'
+# strains in the order of a solved table, resTable[strain][hand]
+pbn_strains = ['S', 'H', 'D', 'C', 'NT']
+
+
+# the hands of a PBN deal such as "N:QJ6.K652.J85.T98 873.J97.AT764.Q4 ...", as a (4, 13) array of card ids
+def parse_hands(text):
+    first, hands = text.split(':')
+    deal = np.empty((4, 13), dtype=int)
+    for i, hand in enumerate(hands.split()):
+        seat = (pbn_seats.index(first.upper()) + i) % 4
+        deal[seat] = sorted(suit * 13 + pbn_ranks.index(rank.upper())
+                            for suit, cards in enumerate(hand.split('.')) for rank in cards if rank != '-')
+    return deal
+
+
+# the par contract of a PAR line, for the side that bids first, as par_contracts returns it
+# entries look like "NS 110" "EW -110" "NS:EW 2S" "EW:EW 2S", a scoring of 0 with no contract is passed out
+def parse_par(entries, dealer):
+    side = 0 if players[dealer] in ['N', 'S'] else 1
+    ns_score = int(entries[side].split()[1])
+    if entries[side].startswith('EW'):
+        ns_score = -ns_score
+
+    contracts = entries[2 + side].split(':', 1)[1].strip()
+    if ns_score == 0 or not contracts or contracts.lower() == 'pass':
+        return (['N', 'S'], 'PASS', 0)
+
+    # all par contracts have the same score, take the first one, at the lowest level when a range like 45N is given
+    declarer, contract = contracts.split(',')[0].split()
+    strain = contract.lstrip('1234567').rstrip('x')
+    contract = contract[0] + ('NT' if strain == 'N' else strain) + ('X' if contract.endswith('x') else '')
+    if declarer[0] in ['N', 'S']:
+        return (['N', 'S'], contract, ns_score)
+    return (['E', 'W'], contract, -ns_score)
+
+
+# (deal, vulnerable, dealer, table, par) of a game read from the file, table and par are None if missing
+def make_record(game):
+    table = game.get('table')
+    if table is not None and (table < 0).any():
+        table = None
+
+    dealer = game.get('dealer', 0)
+    par = game.get('par')
+    if par is not None:
+        par = parse_par(par, dealer)
+
+    return game['deal'], game.get('vulnerable', 'none'), dealer, table, par
+
+
+# records of the games in lines, one game at a time
+def parse_deals(lines):
+    game = {}
+    # the table being read from an OptimumResultTable section
+    results = None
+
+    for line in lines:
+        line = line.strip()
+        fields = line.split()
+
+        # a PBN game ends with an empty line
+        if not fields:
+            if 'deal' in game:
+                yield make_record(game)
+            game = {}
+            results = None
+
+        # DDS test files: PBN dealer vulnerable trump first "deal", then TABLE and PAR lines
+        elif fields[0] == 'PBN':
+            if 'deal' in game:
+                yield make_record(game)
+            game = {'dealer': int(fields[1]), 'vulnerable': dds_vulnerabilities[int(fields[2])],
+                    'deal': parse_hands(line.split('"')[1])}
+
+        elif fields[0] == 'TABLE':
+            game['table'] = np.array(fields[1:], dtype=np.int32).reshape(5, 4)
+
+        elif fields[0] == 'PAR':
+            game['par'] = line.split('"')[1::2]
+
+        # PBN tags: [Name "value"]
+        elif line.startswith('['):
+            results = None
+            name, _, value = line[1:].partition(' ')
+            value = value.rstrip(']').strip().strip('"')
+            key = {'Deal': 'deal', 'Dealer': 'dealer', 'Vulnerable': 'vulnerable'}.get(name)
+
+            # a tag seen twice means the next game has started without an empty line
+            if key is not None and key in game:
+                if 'deal' in game:
+                    yield make_record(game)
+                game = {}
+
+            if name == 'Deal':
+                game['deal'] = parse_hands(value)
+            elif name == 'Dealer' and value in pbn_seats:
+                game['dealer'] = pbn_seats.index(value)
+            elif name == 'Vulnerable' and value in pbn_vulnerabilities:
+                game['vulnerable'] = pbn_vulnerabilities[value]
+            elif name == 'OptimumResultTable':
+                results = np.full((5, 4), -1, dtype=np.int32)
+                game['table'] = results
+
+        # rows of an OptimumResultTable: declarer, strain, tricks
+        elif results is not None and len(fields) >= 3 and fields[0] in pbn_seats and fields[1] in pbn_strains:
+            results[pbn_strains.index(fields[1]), pbn_seats.index(fields[0])] = int(fields[2])
+
+    if 'deal' in game:
+        yield make_record(game)
+
+
+# records of the games in the file at path, read as they are needed
+def read_deals(path):
+    with open(path) as f:
+        yield from parse_deals(f)
+
+
+# all the records of a DDS test file such as dds/hands/list100.txt, as (deal, vulnerable, dealer, table)
+def read_deal_list(path):
+    return [(deal, vulnerable, dealer, table) for deal, vulnerable, dealer, table, par in read_deals(path)]
+
+
+class DealStream:
+
+    # records from the file at path, from the start again when it runs out
+    # state is from get_state, the stream starts where that one had got to
+    def __init__(self, path, batch_size=MAXNOOFTABLES, state=None):
+        self.path = path
+        self.batch_size = batch_size
+        self.deals = read_deals(path)
+        self.records = 0
+        self.solved = 0
+        self.passes = 0
+        # records read in this pass over the file
+        self.position = 0
+
+        if state is not None:
+            for _ in range(state['position']):
+                self.next_record()
+            self.passes = state['passes']
+
+    def next_record(self):
+        record = next(self.deals, None)
+        if record is None:
+            # start over at the end of the file
+            self.passes += 1
+            self.position = 0
+            self.deals = read_deals(self.path)
+            record = next(self.deals, None)
+            if record is None:
+                raise ValueError(f"no deals in {self.path}")
+        self.position += 1
+        return record
+
+    # the next size records, deals without a table are solved in batches, tables and par go in the caches
+    def take(self, size):
+        records = []
+        for start in range(0, size, self.batch_size):
+            batch = [self.next_record() for _ in range(min(self.batch_size, size - start))]
+
+            unsolved = [deal for deal, vulnerable, dealer, table, par in batch if table is None]
+            solved = iter(solve_deals(unsolved) if unsolved else [])
+            self.solved += len(unsolved)
+
+            for deal, vulnerable, dealer, table, par in batch:
+                if table is None:
+                    table = next(solved)
+                else:
+                    store_results(deal, table)
+                if par is not None:
+                    store_par(deal, vulnerable, dealer, par)
+                records.append((deal, vulnerable, dealer, table))
+
+        self.records += len(records)
+        return records
+
+    def stats(self):
+        return {'records': self.records, 'solved': self.solved, 'passes': self.passes}
+
+    # how far into the file the stream has got, for a checkpoint
+    def get_state(self):
+        return {'passes': self.passes, 'position': self.position}
+
+    def close(self):
+        self.deals.close()
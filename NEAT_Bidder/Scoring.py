@@ -1,3 +1,23 @@
+import numpy as np
+
+# Constant tables used by the scoring functions
+doubled_penalty = {'X': {False:[100,300,500,800,1100,1400,1700,2000,2300,2600,2900,3200,3500], 
+                        True:[200,500,800,1100,1400,1700,2000,2300,2600,2900,3200,3500,3800]},
+                    'XX':{False:[200,600,1000,1600,2200,2800,3400,4000,4600,5200,5800,6400,7000],
+                        True:[400,1000,1600,2200,2800,3400,4000,4600,5200,5800,6400,7000,7600]}}
+insult_points = {'N': 0, 'X': 50, 'XX': 100}
+doubled_mult = {'N': 1, 'X': 2, 'XX': 4}
+trick_points = {'C': 20, 'D': 20, 'H': 30, 'S': 30, 'NT': 30}
+
+# Smallest score difference worth 1, 2, ... 24 IMPs
+imp_thresholds = np.array([20, 50, 90, 130, 170, 220, 270, 320, 370, 430, 500, 600, 750,
+                           900, 1100, 1300, 1500, 1750, 2000, 2250, 2500, 3000, 3500, 4000])
+
+# Index orders of the score table. Strains follow the DDS order, so a solved table can index it directly
+strains = ['S', 'H', 'D', 'C', 'NT']
+doubles = ['N', 'X', 'XX']
+
+
 def get_score_from_result(contract, doubled, declarer, vulnerable, making):
     """
     Calculate the final score for a contract
@@ -51,12 +71,7 @@ def get_undertrick_points(tricks_needed, making, doubled, vulnerable):
     Returns:
         int: The penalty points for not making the contract.
     """
-    # hardcoded penaties
-    doubled_penalty = {'X': {False:[100,300,500,800,1100,1400,1700,2000,2300,2600,2900,3200,3500], 
-                            True:[200,500,800,1100,1400,1700,2000,2300,2600,2900,3200,3500,3800]},
-                        'XX':{False:[200,600,1000,1600,2200,2800,3400,4000,4600,5200,5800,6400,7000],
-                            True:[400,1000,1600,2200,2800,3400,4000,4600,5200,5800,6400,7000,7600]}}
-    
+    # hardcoded penaties in doubled_penalty
     if doubled != 'N':
         return -1 * doubled_penalty[doubled][vulnerable][tricks_needed-making-1]
     
@@ -76,8 +91,6 @@ def get_insult(doubled):
         int: The insult bonus points.
     """
 
-    insult_points = {'N': 0, 'X': 50, 'XX': 100}
-
     return insult_points[doubled]
 
 def get_trick_numbers(doubled, tricks_needed, made):
@@ -119,12 +132,10 @@ def get_trick_score(suit, tricks_needed, made, doubled, vulnerable):
         int: The score for the tricks made.
     """
     overtrick_points = [50,100]
-    doubled_mult = {'N': 1, 'X': 2, 'XX': 4}
-    trick_score = {'C': 20, 'D': 20, 'H': 30, 'S': 30, 'NT': 30}
 
     # count score for each trick won over 6 tricks. 
     tricks, overtricks = get_trick_numbers(doubled, tricks_needed, made)
-    score = trick_score[suit]*(tricks-6)*doubled_mult[doubled] + overtricks*overtrick_points[vulnerable == True]*doubled_mult[doubled]
+    score = trick_points[suit]*(tricks-6)*doubled_mult[doubled] + overtricks*overtrick_points[vulnerable == True]*doubled_mult[doubled]
 
     # In NT contracts, the first trick counts for 40, and then subsequent tricks at 30.
     if suit == 'NT':
@@ -151,10 +162,8 @@ def get_game_bonus(vulnerable, doubled, bid, suit):
     """
 
     game_bonus = [300, 500]
-    doubled_mult = {'N': 1, 'X': 2, 'XX': 4}
-    trick_score = {'C': 20, 'D': 20, 'H': 30, 'S': 30, 'NT': 30}
 
-    bid_score = bid * trick_score[suit] * doubled_mult[doubled]
+    bid_score = bid * trick_points[suit] * doubled_mult[doubled]
     if suit == 'NT':
         bid_score += 10 * doubled_mult[doubled]
 
@@ -206,3 +215,57 @@ def get_part_bonus(game_bonus, slam_bonus):
     else:
         return 0
 
+
+def build_score_table():
+    """
+    Precompute get_score_from_result for every contract and result.
+
+    Returns:
+        numpy.ndarray: Scores indexed by [level - 1, strain, doubled, vulnerable, tricks made], 
+        with strain an index into strains, doubled an index into doubles and tricks made from 0 to 13.
+    """
+    table = np.zeros((7, len(strains), len(doubles), 2, 14), dtype=np.int32)
+
+    for level in range(1, 8):
+        for s, strain in enumerate(strains):
+            for d, doubled in enumerate(doubles):
+                for vulnerable in [False, True]:
+                    for making in range(14):
+                        contract = str(level) + strain
+                        table[level - 1, s, d, int(vulnerable), making] = get_score_from_result(contract, doubled, 'N', vulnerable, making)
+
+    return table
+
+
+score_table = build_score_table()
+
+
+def score_contracts(levels, strain_indices, doubled_indices, vulnerable, making):
+    """
+    Score arrays of contracts and results in one vectorized lookup. The arguments broadcast against each other.
+
+    Args:
+        levels (array of int): The levels of the contracts, 1 to 7.
+        strain_indices (array of int): The strains of the contracts, as indices into strains ('S', 'H', 'D', 'C', 'NT').
+        doubled_indices (array of int): The doubled states, as indices into doubles ('N', 'X', 'XX').
+        vulnerable (array of bool): Whether each declarer's side is vulnerable.
+        making (array of int): The number of tricks made by each declarer's side.
+
+    Returns:
+        numpy.ndarray: The scores for the contracts.
+    """
+    return score_table[np.asarray(levels) - 1, strain_indices, doubled_indices, np.asarray(vulnerable, dtype=int), making]
+
+
+def imps(differences):
+    """
+    Convert score differences between the two tables of a duplicate board to International Match Points.
+
+    Args:
+        differences (array of int): Score differences, positive for the side that did better.
+
+    Returns:
+        numpy.ndarray: The IMPs, from -24 to 24, with the sign of the differences.
+    """
+    differences = np.asarray(differences)
+    return np.sign(differences) * np.searchsorted(imp_thresholds, np.abs(differences), side='right')
@@ -0,0 +1,144 @@
+import cProfile
+import functools
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+import neat
+"""Cumulative timers and call counters for the stages of training, and a NEAT reporter for them.
+
+Functions on the hot path are wrapped with @timed(stage). While timing is switched off, which is the
+default, the wrapper only checks a flag. Times are inclusive, a stage that calls another timed stage
+(a game calling the solver, say) counts the time of both.
+
+Stages timed on other threads, such as the producers of a DealPipeline solving deals in the background,
+run alongside the main thread rather than on its critical path. They are kept apart, as the background
+stages.
+
+TimingReporter switches timing on, and writes one JSON line per generation with the seconds and calls
+of every stage. It can also run cProfile over chosen generations.
+"""
+
+enabled = False
+
+seconds = defaultdict(float)
+calls = defaultdict(int)
+
+# stages timed on other threads, updated by several threads at once
+background_seconds = defaultdict(float)
+background_calls = defaultdict(int)
+background_lock = threading.Lock()
+
+
+# add a call taking elapsed seconds to the stage, of the main thread or the background
+def record(stage, elapsed):
+    if threading.current_thread() is threading.main_thread():
+        seconds[stage] += elapsed
+        calls[stage] += 1
+    else:
+        with background_lock:
+            background_seconds[stage] += elapsed
+            background_calls[stage] += 1
+
+
+# decorator adding the time of every call to the stage
+def timed(stage):
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return function(*args, **kwargs)
+
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                record(stage, time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+# for timing part of a function: started = start() ... stop(stage, started)
+def start():
+    return time.perf_counter() if enabled else 0.0
+
+def stop(stage, started):
+    if enabled:
+        record(stage, time.perf_counter() - started)
+
+
+def snapshot():
+    return {stage: {'seconds': seconds[stage], 'calls': calls[stage]} for stage in seconds}
+
+def background_snapshot():
+    with background_lock:
+        return {stage: {'seconds': background_seconds[stage], 'calls': background_calls[stage]}
+                for stage in background_seconds}
+
+# add the timings of another process, e.g. a worker
+def merge(timings):
+    for stage, timing in timings.items():
+        seconds[stage] += timing['seconds']
+        calls[stage] += timing['calls']
+
+def reset():
+    seconds.clear()
+    calls.clear()
+    with background_lock:
+        background_seconds.clear()
+        background_calls.clear()
+
+
+class TimingReporter(neat.reporting.BaseReporter):
+
+    # timings are written to path as JSON lines, generations in profile_generations are profiled
+    # into profile_dir/generation_<n>.prof, only the main process is profiled
+    def __init__(self, path, profile_generations=(), profile_dir='.'):
+        global enabled
+        enabled = True
+
+        self.path = path
+        self.profile_generations = set(profile_generations)
+        self.profile_dir = profile_dir
+        self.profiler = None
+        self.generation = None
+        self.generation_start = None
+        self.evaluation_seconds = None
+
+    def start_generation(self, generation):
+        reset()
+        self.generation = generation
+        self.generation_start = time.perf_counter()
+        self.evaluation_seconds = None
+
+        if generation in self.profile_generations:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+
+    def post_evaluate(self, config, population, species, best_genome):
+        self.evaluation_seconds = time.perf_counter() - self.generation_start
+
+    def end_generation(self, config, population, species_set):
+        self.write()
+
+    # the last generation ends here, without end_generation, when the fitness threshold is reached
+    def found_solution(self, config, generation, best):
+        if self.generation_start is not None:
+            self.write()
+
+    def write(self):
+        if self.profiler is not None:
+            self.profiler.disable()
+            self.profiler.dump_stats(os.path.join(self.profile_dir, f"generation_{self.generation}.prof"))
+            self.profiler = None
+
+        record = {'generation': self.generation,
+                  'seconds': time.perf_counter() - self.generation_start,
+                  'evaluation_seconds': self.evaluation_seconds,
+                  'stages': snapshot(),
+                  'background': background_snapshot()}
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+
+        self.generation_start = None
@@ -0,0 +1,70 @@
+import unittest
+from Auction import Auction, all_bids, bid_to_int
+
+N, E, S, W = range(4)
+
+
+class TestAuction(unittest.TestCase):
+
+    def legal(self, auction, player):
+        return [bid for bid, legal in zip(all_bids, auction.legal_bids(player)) if legal]
+
+    def bid(self, auction, player, bid):
+        auction.add_bid(player, bid_to_int[bid])
+
+    def test_opening(self):
+        auction = Auction()
+        self.assertEqual(self.legal(auction, N), ['PASS'] + all_bids[3:])
+
+    def test_higher_bids_only(self):
+        auction = Auction()
+        self.bid(auction, N, '2H')
+        self.assertEqual(self.legal(auction, E), ['PASS', 'X'] + all_bids[bid_to_int['2S']:])
+        # partner can't double
+        self.assertEqual(self.legal(auction, S), ['PASS'] + all_bids[bid_to_int['2S']:])
+
+    def test_doubles(self):
+        auction = Auction()
+        self.bid(auction, N, '1NT')
+        self.bid(auction, E, 'X')
+        self.assertEqual(self.legal(auction, S)[:2], ['PASS', 'XX'])
+        self.assertNotIn('X', self.legal(auction, W))
+        self.bid(auction, S, 'XX')
+        self.assertNotIn('X', self.legal(auction, W))
+        self.assertNotIn('XX', self.legal(auction, W))
+        self.assertEqual(auction.get_last_bid(), ('N', '1NT', 'XX'))
+
+    def test_new_contract_clears_double(self):
+        auction = Auction()
+        self.bid(auction, N, '1C')
+        self.bid(auction, E, 'X')
+        self.bid(auction, S, '1D')
+        self.assertEqual(auction.get_last_bid(), ('S', '1D', 'N'))
+        self.assertIn('X', self.legal(auction, W))
+
+    def test_finished(self):
+        auction = Auction()
+        for player in range(3):
+            self.bid(auction, player, 'PASS')
+        self.assertFalse(auction.is_finished())
+        self.bid(auction, W, '1S')
+        for player in range(3):
+            self.assertFalse(auction.is_finished())
+            self.bid(auction, player, 'PASS')
+        self.assertTrue(auction.is_finished())
+        self.assertEqual(auction.get_previous_bids()[3], ['W', '1S'])
+
+    def test_passed_out(self):
+        auction = Auction()
+        for player in range(4):
+            self.bid(auction, player, 'PASS')
+        self.assertTrue(auction.is_finished())
+        self.assertEqual(auction.get_last_bid()[1], 'PASS')
+
+    def test_masks_are_read_only(self):
+        with self.assertRaises(ValueError):
+            Auction().legal_bids(N)[0] = False
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import contextlib
+import io
+import unittest
+from unittest import mock
+import numpy as np
+import BatchedAuction as batched
+import NEAT_bidder
+from BatchedAuction import BatchedAuction, best_scores
+from FitnessCache import fitness_cache
+from Evaluation import draw_deal_pool
+from GameState import GameState
+from test_helpers import load_config, random_genomes
+
+
+class TestBatchedAuction(unittest.TestCase):
+
+    def setUp(self):
+        self.config = load_config()
+        self.genomes = [genome for key, genome in random_genomes(self.config, 2, 20)]
+
+        self.deal_pool = draw_deal_pool(8, np.random.default_rng(0))
+
+    def test_matches_game_state(self):
+        games = BatchedAuction(*self.genomes, self.config, self.deal_pool)
+        games.play()
+        scores = games.calculate_scores()
+
+        for i, (deal, vulnerable, dealer, table) in enumerate(self.deal_pool):
+            game = GameState(*self.genomes, self.config, deal, vulnerable, dealer)
+            while game.bidding_is_finished() == False:
+                game.add_bid()
+
+            self.assertEqual(len(game.auction.bids), games.bid_count[i])
+            self.assertEqual(game.auction.contract, games.contract[i])
+            self.assertEqual(game.auction.doubled, games.doubled[i])
+            self.assertEqual(game.calculate_scores(), list(scores[i]))
+
+    def test_duplicate_matches_game_state(self):
+        games = BatchedAuction(*self.genomes, self.config, self.deal_pool)
+        games.play()
+        replay = BatchedAuction(*reversed(self.genomes), self.config, self.deal_pool)
+        replay.play()
+        scores = games.duplicate_scores(replay)
+
+        for i, (deal, vulnerable, dealer, table) in enumerate(self.deal_pool):
+            game = GameState(*self.genomes, self.config, deal, vulnerable, dealer)
+            while game.bidding_is_finished() == False:
+                game.add_bid()
+            swapped = game.swapped()
+            while swapped.bidding_is_finished() == False:
+                swapped.add_bid()
+
+            self.assertEqual(game.duplicate_scores(swapped), list(scores[i]))
+
+        # swapping the genomes swaps the tables
+        np.testing.assert_array_equal(replay.duplicate_scores(games), -scores)
+
+    def test_best_scores_once_per_pool(self):
+        games = BatchedAuction(*self.genomes, self.config, self.deal_pool, best_scores(self.deal_pool))
+        games.play()
+        expected = BatchedAuction(*self.genomes, self.config, self.deal_pool)
+        expected.play()
+        np.testing.assert_array_equal(games.calculate_scores(), expected.calculate_scores())
+
+        # a generation of 2 pairs works out the best contract of each deal once
+        fitness_cache.clear()
+        NEAT_bidder.trials = 4
+        NEAT_bidder.eval_rng = np.random.default_rng(0)
+        genomes = list(enumerate(self.genomes + self.genomes))
+        try:
+            with mock.patch.object(batched, 'return_best_contract', wraps=batched.return_best_contract) as best:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    NEAT_bidder.eval_genomes(genomes, self.config)
+        finally:
+            NEAT_bidder.trials = 20
+            fitness_cache.clear()
+        self.assertEqual(best.call_count, 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
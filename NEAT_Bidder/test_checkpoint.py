@@ -0,0 +1,46 @@
+import contextlib
+import io
+import os
+import re
+import tempfile
+import unittest
+import NEAT_bidder
+from test_helpers import config_path
+
+
+class TestCheckpoint(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.directory.name)
+
+        # a small population, so a few generations are quick
+        with open(config_path) as f:
+            text = f.read()
+        with open('config-small', 'w') as f:
+            f.write(re.sub(r'pop_size\s*=\s*\d+', 'pop_size = 10', text))
+
+        NEAT_bidder.trials = 3
+        NEAT_bidder.generations_total = 4
+
+    def tearDown(self):
+        NEAT_bidder.trials = 20
+        NEAT_bidder.generations_total = 100
+        os.chdir(self.cwd)
+        self.directory.cleanup()
+
+    def run_neat(self, **kwargs):
+        with contextlib.redirect_stdout(io.StringIO()):
+            winner = NEAT_bidder.run_neat('config-small', 1, checkpoint_interval=2, corpus_path='none.bin', **kwargs)
+        return winner.key, winner.fitness, sorted(winner.connections), sorted(winner.nodes)
+
+    def test_resume(self):
+        winner = self.run_neat(seed=5)
+        self.assertTrue(os.path.exists('neat-checkpoint-2'))
+        # the seed doesn't matter, the random states come from the checkpoint
+        self.assertEqual(self.run_neat(resume='neat-checkpoint-2'), winner)
+
+
+if __name__ == '__main__':
+    unittest.main()
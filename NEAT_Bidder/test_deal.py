@@ -0,0 +1,47 @@
+import unittest
+import numpy as np
+from Deal import card_from_string, card_to_string, deal_from_strings, hand_to_strings, random_deal
+from DSS_adapter import convert_initial_to_DDS_format, convert_DDS_to_initial_format
+
+# the first deal of dds/hands/list10.txt, "N:QJ6.K652.J85.T98 873.J97.AT764.Q4 K5.T83.KQ9.A7652 AT942.AQ4.32.KJ3"
+first_deal = {'N': ['QS', 'JS', '6S', 'KH', '6H', '5H', '2H', 'JD', '8D', '5D', '10C', '9C', '8C'],
+              'E': ['8S', '7S', '3S', 'JH', '9H', '7H', 'AD', '10D', '7D', '6D', '4D', 'QC', '4C'],
+              'S': ['KS', '5S', '10H', '8H', '3H', 'KD', 'QD', '9D', 'AC', '7C', '6C', '5C', '2C'],
+              'W': ['AS', '10S', '9S', '4S', '2S', 'AH', 'QH', '4H', '3D', '2D', 'KC', 'JC', '3C']}
+
+# its ddTableDeal, cards[hand][suit] with bit 2 for a 2 up to bit 14 for an ace
+first_deal_masks = [[6208, 8292, 2336, 1792],
+                    [392, 2688, 17616, 4112],
+                    [8224, 1288, 12800, 16612],
+                    [17940, 20496, 12, 10248]]
+
+
+class TestDeal(unittest.TestCase):
+
+    def test_card_strings(self):
+        for card in range(52):
+            self.assertEqual(card_from_string(card_to_string(card)), card)
+        self.assertEqual(card_to_string(0), 'AS')
+        self.assertEqual(card_to_string(51), '2C')
+        self.assertEqual(card_from_string('10H'), 13 + 4)
+
+    def test_deal_from_strings(self):
+        deal = deal_from_strings(first_deal)
+        for i, player in enumerate(['N', 'E', 'S', 'W']):
+            self.assertEqual(hand_to_strings(deal[i]), first_deal[player])
+
+    def test_dds_format(self):
+        deal = deal_from_strings(first_deal)
+        cards = convert_initial_to_DDS_format(deal)
+        np.testing.assert_array_equal(cards, first_deal_masks)
+        np.testing.assert_array_equal(convert_DDS_to_initial_format(cards), deal)
+
+    def test_dds_round_trip(self):
+        rng = np.random.default_rng(0)
+        for _ in range(100):
+            deal = random_deal(rng)
+            np.testing.assert_array_equal(convert_DDS_to_initial_format(convert_initial_to_DDS_format(deal)), deal)
+
+
+if __name__ == '__main__':
+    unittest.main()
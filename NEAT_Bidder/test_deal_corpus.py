@@ -0,0 +1,46 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+import numpy as np
+import DSS_adapter
+from Deal import random_deal, vulnerabilities
+from DealCorpus import DealCorpus, generate_corpus
+
+
+class TestDealCorpus(unittest.TestCase):
+
+    def setUp(self):
+        DSS_adapter.clear_cache()
+
+    def test_round_trip(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'deals.bin')
+            with contextlib.redirect_stdout(io.StringIO()):
+                generate_corpus(path, 6, np.random.default_rng(0), batch_size=4)
+            corpus = DealCorpus(path)
+            records = [corpus.get(i) for i in range(len(corpus))]
+            del corpus
+        # the tables are solved again, not taken from the cache generate_corpus filled
+        DSS_adapter.clear_cache()
+
+        # the same draws as generate_corpus, batch by batch
+        rng = np.random.default_rng(0)
+        expected = []
+        for size in [4, 2]:
+            deals = [random_deal(rng) for _ in range(size)]
+            vulnerable = rng.integers(len(vulnerabilities), size=size)
+            dealers = rng.integers(4, size=size)
+            expected += zip(deals, vulnerable, dealers)
+
+        self.assertEqual(len(records), 6)
+        for (deal, vulnerable, dealer, table), (expected_deal, vulnerability, expected_dealer) in zip(records, expected):
+            np.testing.assert_array_equal(deal, expected_deal)
+            self.assertEqual(vulnerable, vulnerabilities[vulnerability])
+            self.assertEqual(dealer, expected_dealer)
+            np.testing.assert_array_equal(table, DSS_adapter.getFullResults(deal))
+
+
+if __name__ == '__main__':
+    unittest.main()
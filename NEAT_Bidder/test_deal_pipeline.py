@@ -0,0 +1,61 @@
+import unittest
+import numpy as np
+import DSS_adapter
+from DealPipeline import DealPipeline
+from Deal import vulnerabilities
+
+
+class TestDealPipeline(unittest.TestCase):
+
+    def test_records_are_solved(self):
+        pipeline = DealPipeline(np.random.default_rng(3), producers=1, depth=4, batch_size=2)
+        try:
+            records = pipeline.take(5)
+        finally:
+            pipeline.close()
+
+        DSS_adapter.clear_cache()
+        for deal, vulnerable, dealer, table in records:
+            self.assertIn(vulnerable, vulnerabilities)
+            self.assertIn(dealer, range(4))
+            np.testing.assert_array_equal(DSS_adapter.getFullResults(deal), table)
+        self.assertEqual(pipeline.stats()['records'], 5)
+
+    def test_same_records_for_same_seed(self):
+        pools = []
+        for _ in range(2):
+            pipeline = DealPipeline(np.random.default_rng(5), producers=1, depth=2, batch_size=2)
+            pools.append(pipeline.take(3))
+            pipeline.close()
+
+        for first, second in zip(*pools):
+            np.testing.assert_array_equal(first[0], second[0])
+            self.assertEqual(first[1:3], second[1:3])
+
+    def test_resume_from_state(self):
+        pipeline = DealPipeline(np.random.default_rng(7), producers=1, depth=2, batch_size=2)
+        try:
+            records = pipeline.take(6)
+        finally:
+            pipeline.close()
+
+        # a pipeline that took 3 records, and one carrying on from its state
+        pipeline = DealPipeline(np.random.default_rng(7), producers=1, depth=2, batch_size=2)
+        taken = pipeline.take(3)
+        state = pipeline.get_state()
+        pipeline.close()
+        self.assertEqual(state['taken'], [3])
+        pipeline = DealPipeline(np.random.default_rng(8), producers=1, depth=2, batch_size=2, state=state)
+        try:
+            resumed = taken + pipeline.take(3)
+        finally:
+            pipeline.close()
+
+        for first, second in zip(records, resumed):
+            np.testing.assert_array_equal(first[0], second[0])
+            self.assertEqual(first[1:3], second[1:3])
+            np.testing.assert_array_equal(first[3], second[3])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import os
+import threading
+import unittest
+from unittest import mock
+from multiprocessing.connection import Client
+import numpy as np
+from Distributed import Coordinator, run_worker
+from Evaluation import draw_deal_pool, play_trials
+from FitnessCache import fitness_cache
+from test_helpers import config_path, load_config, random_genomes
+
+
+# a worker that takes a task and never answers it
+def stalled_worker(address, authkey, received):
+    connection = Client(address, authkey=authkey)
+    while True:
+        message = connection.recv()
+        if message[0] == 'task':
+            received.set()
+            return connection
+
+
+class TestDistributed(unittest.TestCase):
+
+    def setUp(self):
+        self.config = load_config()
+        self.genomes = random_genomes(self.config, 4)
+
+        fitness_cache.clear()
+        self.coordinator = Coordinator(config_path, 4, np.random.default_rng(0), ('localhost', 0), task_timeout=2.0)
+        self.workers = []
+
+    def tearDown(self):
+        self.coordinator.close()
+        for worker in self.workers:
+            worker.join()
+
+    def start_worker(self):
+        worker = threading.Thread(target=run_worker, args=(self.coordinator.address, self.coordinator.authkey))
+        worker.start()
+        self.workers.append(worker)
+
+    def expected_fitness(self):
+        deal_pool = draw_deal_pool(4, np.random.default_rng(0))
+        fitness = []
+        for (key1, genome1), (key2, genome2) in zip(self.genomes[0::2], self.genomes[1::2]):
+            fitness += play_trials(genome1, genome2, self.config, deal_pool)[:2]
+        return fitness
+
+    def test_matches_serial(self):
+        self.start_worker()
+        self.start_worker()
+        self.coordinator.evaluate(self.genomes, self.config)
+
+        self.assertEqual([genome.fitness for key, genome in self.genomes], self.expected_fitness())
+
+    def test_timed_out_task_is_reassigned(self):
+        received = threading.Event()
+        result = []
+        stalled = threading.Thread(target=lambda: result.append(stalled_worker(self.coordinator.address, self.coordinator.authkey, received)))
+        stalled.start()
+
+        evaluation = threading.Thread(target=self.coordinator.evaluate, args=(self.genomes, self.config))
+        evaluation.start()
+        received.wait()
+        # a worker joining late picks up what the stalled one doesn't answer
+        self.start_worker()
+        evaluation.join()
+        stalled.join()
+        result[0].close()
+
+        self.assertEqual(self.coordinator.reassigned, 1)
+        self.assertEqual([genome.fitness for key, genome in self.genomes], self.expected_fitness())
+
+    def test_worker_needs_key(self):
+        with mock.patch.dict(os.environ):
+            os.environ.pop('NEAT_BIDDER_AUTHKEY', None)
+            with self.assertRaises(ValueError):
+                run_worker(self.coordinator.address, connect_timeout=0.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
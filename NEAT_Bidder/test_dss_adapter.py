@@ -0,0 +1,88 @@
+import os
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import DSS_adapter
+from GameState import GameState
+from PBNReader import read_deal_list
+from test_helpers import load_config, random_genomes
+
+deals_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dds', 'hands', 'list10.txt')
+
+
+class TestDSSAdapter(unittest.TestCase):
+
+    def setUp(self):
+        self.deal_list = read_deal_list(deals_path)[:6]
+        DSS_adapter.clear_cache()
+
+    def test_results_are_arrays(self):
+        deal, vulnerable, dealer, table = self.deal_list[0]
+        first = DSS_adapter.getFullResults(deal)
+        np.testing.assert_array_equal(first, table)
+
+        # solving another deal doesn't change the table already returned
+        DSS_adapter.getFullResults(self.deal_list[1][0])
+        np.testing.assert_array_equal(first, table)
+        with self.assertRaises(ValueError):
+            first[0, 0] = 0
+
+    def test_threads(self):
+        with ThreadPoolExecutor(3) as pool:
+            tables = list(pool.map(DSS_adapter.getFullResults, [record[0] for record in self.deal_list]))
+
+        for solved, (deal, vulnerable, dealer, table) in zip(tables, self.deal_list):
+            np.testing.assert_array_equal(solved, table)
+
+    def test_cache_stats(self):
+        config = load_config()
+        genomes = [genome for key, genome in random_genomes(config, 2, 20)]
+
+        played = 0
+        for deal, vulnerable, dealer, table in self.deal_list:
+            game = GameState(*genomes, config, deal, vulnerable, dealer)
+            while game.bidding_is_finished() == False:
+                game.add_bid()
+            # a passed out game scores 0 without looking at the table
+            if game.get_last_bid()[1] == 'PASS':
+                continue
+
+            DSS_adapter.clear_cache()
+            game.calculate_scores()
+            # the best contract solves the deal, the score of every bot reuses the table
+            stats = DSS_adapter.get_cache_stats()
+            self.assertEqual(stats['misses'], 1)
+            self.assertGreaterEqual(stats['hits'], 4)
+            played += 1
+        self.assertGreater(played, 0)
+
+    def test_max_threads_keeps_memory(self):
+        saved = DSS_adapter.resources or (0, 0)
+        try:
+            DSS_adapter.set_resources(512, 0)
+            DSS_adapter.set_max_threads(1)
+            self.assertEqual(DSS_adapter.resources, (512, 1))
+        finally:
+            DSS_adapter.set_resources(*saved)
+
+    def test_par_is_cached(self):
+        deal, vulnerable, dealer, table = self.deal_list[0]
+        par = DSS_adapter.return_best_contract(deal, vulnerable, dealer, 'par')
+        self.assertEqual(DSS_adapter.par_cache.stats(), {'hits': 0, 'misses': 1, 'size': 1})
+
+        self.assertEqual(DSS_adapter.return_best_contract(deal, vulnerable, dealer, 'par'), par)
+        self.assertEqual(DSS_adapter.par_cache.stats()['hits'], 1)
+
+    def test_par_passed_out(self):
+        deal, vulnerable, dealer, table = self.deal_list[0]
+        # nobody makes more than 6 tricks in any strain
+        passed_out = np.full((5, 4), 6, dtype=np.int32)
+
+        # the contract of the deal before is still in the buffer when the passed out one is read
+        contracts = DSS_adapter.par_contracts([table, passed_out], [vulnerable, 'none'], [dealer, 0])
+        self.assertNotEqual(contracts[0][1], 'PASS')
+        self.assertEqual(contracts[1], (['N','S'], 'PASS', 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+import contextlib
+import io
+import unittest
+import numpy as np
+import NEAT_bidder
+from Evaluation import ParallelEvaluator
+from FitnessCache import fitness_cache
+from test_helpers import config_path, load_config, random_genomes
+
+
+class TestParallelEvaluator(unittest.TestCase):
+
+    def setUp(self):
+        self.config = load_config()
+        self.genomes = random_genomes(self.config, 6)
+        NEAT_bidder.trials = 4
+        fitness_cache.clear()
+
+    def tearDown(self):
+        NEAT_bidder.trials = 20
+        fitness_cache.clear()
+
+    def test_matches_serial(self):
+        evaluator = ParallelEvaluator(2, config_path, 4, np.random.default_rng(0))
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                evaluator.evaluate(self.genomes, self.config)
+        finally:
+            evaluator.close()
+        parallel = [genome.fitness for key, genome in self.genomes]
+
+        fitness_cache.clear()
+        NEAT_bidder.eval_rng = np.random.default_rng(0)
+        with contextlib.redirect_stdout(io.StringIO()):
+            NEAT_bidder.eval_genomes(self.genomes, self.config)
+
+        self.assertEqual(parallel, [genome.fitness for key, genome in self.genomes])
+
+
+if __name__ == '__main__':
+    unittest.main()
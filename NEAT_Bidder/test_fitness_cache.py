@@ -0,0 +1,97 @@
+import contextlib
+import copy
+import io
+import unittest
+from unittest import mock
+import neat
+import numpy as np
+import FitnessCache
+import NEAT_bidder
+from FitnessCache import fitness_cache, genome_hash
+from test_helpers import load_config, random_genomes
+
+
+class TestFitnessCache(unittest.TestCase):
+
+    def setUp(self):
+        self.config = load_config()
+        self.genomes = random_genomes(self.config, 4)
+
+        NEAT_bidder.trials = 4
+        fitness_cache.clear()
+
+    def tearDown(self):
+        NEAT_bidder.trials = 20
+        fitness_cache.clear()
+        fitness_cache.carry = False
+
+    # the fitness of the genomes after a generation, and the number of pairs that were played
+    def evaluate(self, genomes, seed):
+        NEAT_bidder.eval_rng = np.random.default_rng(seed)
+        with mock.patch.object(NEAT_bidder, 'play_trials', wraps=NEAT_bidder.play_trials) as play_trials:
+            with contextlib.redirect_stdout(io.StringIO()) as output:
+                NEAT_bidder.eval_genomes(genomes, self.config)
+        # the line the fitness cache printed
+        self.report = output.getvalue().splitlines()[-1]
+        return [genome.fitness for key, genome in genomes], play_trials.call_count
+
+    def test_genome_hash(self):
+        genome = self.genomes[0][1]
+        clone = copy.deepcopy(genome)
+        clone.key = 99
+        self.assertEqual(genome_hash(genome), genome_hash(clone))
+
+        connection = next(iter(clone.connections.values()))
+        connection.weight += 0.5
+        self.assertNotEqual(genome_hash(genome), genome_hash(clone))
+
+    def test_identical_evaluation_is_reused(self):
+        fitness, played = self.evaluate(self.genomes, 0)
+        self.assertEqual(played, 2)
+        self.assertEqual(self.report, "fitness cache: 2 pairs played, 0 reused")
+
+        # the same pairs on the same deals
+        for key, genome in self.genomes:
+            genome.fitness = None
+        self.assertEqual(self.evaluate(self.genomes, 0), (fitness, 0))
+        self.assertEqual(self.report, "fitness cache: 0 pairs played, 2 reused")
+
+    def test_without_carry_new_deals_are_played(self):
+        self.evaluate(self.genomes, 0)
+        fitness, played = self.evaluate(self.genomes, 1)
+        self.assertEqual(played, 2)
+        self.assertEqual(self.report, "fitness cache: 2 pairs played, 0 reused")
+        self.assertEqual(fitness_cache.running, {})
+
+    def test_carry(self):
+        fitness_cache.carry = True
+        fitness, played = self.evaluate(self.genomes, 0)
+        self.assertEqual(played, 2)
+
+        # known genomes aren't played with new deals, they keep their fitness
+        for key, genome in self.genomes:
+            genome.fitness = None
+        self.assertEqual(self.evaluate(self.genomes, 1), (fitness, 0))
+
+        # a new genome is paired with a known one, which gets the running average of both evaluations
+        new = neat.DefaultGenome(4)
+        new.configure_new(self.config.genome_config)
+        fitness, played = self.evaluate(self.genomes + [(4, new)], 2)
+        self.assertEqual(played, 1)
+        self.assertEqual(self.report, "fitness cache: 1 pairs played, 0 reused, 3 genomes carried")
+        partner = self.genomes[0][1]
+        running = fitness_cache.running[genome_hash(partner)]
+        self.assertEqual(running[1], 2)
+        self.assertEqual(partner.fitness, running[0] / 2)
+
+    def test_hash_once_per_generation(self):
+        with mock.patch.object(FitnessCache, 'genome_hash', wraps=genome_hash) as hashes:
+            self.evaluate(self.genomes, 0)
+            self.assertEqual(hashes.call_count, 4)
+            # the next generation works them out again
+            self.evaluate(self.genomes, 1)
+            self.assertEqual(hashes.call_count, 8)
+
+
+if __name__ == '__main__':
+    unittest.main()
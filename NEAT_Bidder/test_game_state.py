@@ -0,0 +1,83 @@
+import tracemalloc
+import unittest
+import numpy as np
+from Evaluation import draw_deal_pool
+from GameState import GameState
+from test_helpers import load_config, random_genomes
+
+
+def play(game):
+    while game.bidding_is_finished() == False:
+        game.add_bid()
+    return game.calculate_scores()
+
+
+class TestGameState(unittest.TestCase):
+
+    def setUp(self):
+        self.config = load_config()
+        self.genomes = [genome for key, genome in random_genomes(self.config, 2, 20)]
+
+        self.deal_pool = draw_deal_pool(8, np.random.default_rng(0))
+
+    def test_reset_matches_new_game(self):
+        game = GameState(*self.genomes, self.config, *self.deal_pool[0][:3])
+        bots = list(game.bots)
+
+        for i, (deal, vulnerable, dealer, table) in enumerate(self.deal_pool):
+            # the genomes change sides every other game
+            genomes = self.genomes if i % 2 == 0 else self.genomes[::-1]
+            game.reset(deal, vulnerable, dealer, genomes)
+            fresh = GameState(*genomes, self.config, deal, vulnerable, dealer)
+
+            np.testing.assert_array_equal(game.bots[1].inputs, fresh.bots[1].inputs)
+            self.assertEqual(play(game), play(fresh))
+            self.assertEqual(game.get_previous_bids(), fresh.get_previous_bids())
+            self.assertEqual(game.bots[2].possible_bids, fresh.bots[2].possible_bids)
+
+        # the same bots played every game
+        self.assertEqual([id(bot) for bot in game.bots], [id(bot) for bot in bots])
+
+    def test_swapped_is_reused(self):
+        game = GameState(*self.genomes, self.config, *self.deal_pool[0][:3])
+        mirror = None
+
+        for deal, vulnerable, dealer, table in self.deal_pool:
+            game.reset(deal, vulnerable, dealer)
+            play(game)
+            swapped = game.swapped()
+            if mirror is None:
+                mirror = swapped
+            self.assertIs(swapped, mirror)
+
+            fresh = GameState(*reversed(self.genomes), self.config, deal, vulnerable, dealer)
+            self.assertEqual(play(swapped), play(fresh))
+            self.assertEqual(game.duplicate_scores(swapped), game.duplicate_scores(fresh))
+
+    def test_memory_is_flat(self):
+        game = GameState(*self.genomes, self.config, *self.deal_pool[0][:3])
+
+        def play_pool(times):
+            for _ in range(times):
+                for deal, vulnerable, dealer, table in self.deal_pool:
+                    game.reset(deal, vulnerable, dealer)
+                    play(game)
+                    # and the other table of a duplicate board
+                    play(game.swapped())
+
+        # the networks and tables are cached by the first games
+        play_pool(2)
+        tracemalloc.start()
+        try:
+            play_pool(2)
+            before = tracemalloc.get_traced_memory()[0]
+            play_pool(20)
+            after = tracemalloc.get_traced_memory()[0]
+        finally:
+            tracemalloc.stop()
+
+        self.assertLess(after - before, 4096)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,32 @@
+import os
+import random
+import neat
+from NumpyNetwork import network_cache
+"""Setup shared by the tests that play genomes: the config of config-feedforward and random genomes.
+
+The nets of the bots are cached by genome key, and every test file makes genomes with keys 0, 1, ...,
+so load_config clears the cache, and no test plays the nets of another test's genomes.
+"""
+
+config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config-feedforward')
+
+
+# the config, with the random seed and the cached networks reset
+def load_config():
+    random.seed(0)
+    network_cache.clear()
+    return neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction,
+                              neat.DefaultSpeciesSet, neat.DefaultStagnation,
+                              config_path)
+
+
+# (key, genome) of count new genomes with keys from 0, each mutated mutations times
+def random_genomes(config, count, mutations=10):
+    genomes = []
+    for key in range(count):
+        genome = neat.DefaultGenome(key)
+        genome.configure_new(config.genome_config)
+        for _ in range(mutations):
+            genome.mutate(config.genome_config)
+        genomes.append((key, genome))
+    return genomes
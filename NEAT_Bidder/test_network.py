@@ -0,0 +1,72 @@
+import random
+import unittest
+import neat
+import numpy as np
+from NumpyNetwork import NumpyFeedForwardNetwork, NetworkCache
+from test_helpers import load_config, random_genomes
+
+
+class TestNumpyNetwork(unittest.TestCase):
+
+    def setUp(self):
+        self.config = load_config()
+        self.genome = random_genomes(self.config, 1, mutations=0)[0][1]
+
+    def random_inputs(self):
+        return [random.uniform(-1, 12) for _ in range(self.config.genome_config.num_inputs)]
+
+    def assert_matches_neat(self, genome):
+        expected_net = neat.nn.FeedForwardNetwork.create(genome, self.config)
+        net = NumpyFeedForwardNetwork.create(genome, self.config)
+
+        inputs = [self.random_inputs() for _ in range(5)]
+        expected = [expected_net.activate(x) for x in inputs]
+
+        for x, outputs in zip(inputs, expected):
+            np.testing.assert_allclose(net.activate(x), outputs, rtol=1e-9, atol=1e-12)
+        np.testing.assert_allclose(net.activate_batch(np.array(inputs)), expected, rtol=1e-9, atol=1e-12)
+
+    def test_full_direct(self):
+        # new genomes connect every input straight to every output
+        self.assert_matches_neat(self.genome)
+
+    def test_hidden_nodes(self):
+        # add hidden nodes, new connections and disabled connections
+        for _ in range(5):
+            self.genome.mutate_add_node(self.config.genome_config)
+        for _ in range(20):
+            self.genome.mutate_add_connection(self.config.genome_config)
+            self.genome.mutate(self.config.genome_config)
+        self.assert_matches_neat(self.genome)
+
+    def test_unconnected_output(self):
+        # outputs without any connection stay at 0
+        for key in list(self.genome.connections):
+            if key[1] == 0:
+                del self.genome.connections[key]
+        self.assert_matches_neat(self.genome)
+        self.assertEqual(NumpyFeedForwardNetwork.create(self.genome, self.config).activate(self.random_inputs())[0], 0.0)
+
+    def test_wrong_input_size(self):
+        net = NumpyFeedForwardNetwork.create(self.genome, self.config)
+        with self.assertRaises(RuntimeError):
+            net.activate([0.0])
+
+
+    def test_cache(self):
+        cache = NetworkCache()
+        net = cache.get(self.genome, self.config)
+        self.assertIs(cache.get(self.genome, self.config), net)
+        self.assertEqual(cache.stats(), {'hits': 1, 'misses': 1, 'size': 1})
+
+        # the same generation keeps its networks, a new one starts empty
+        cache.start_generation(0)
+        cache.get(self.genome, self.config)
+        cache.start_generation(0)
+        self.assertIs(cache.get(self.genome, self.config), cache.get(self.genome, self.config))
+        cache.start_generation(1)
+        self.assertEqual(cache.stats()['size'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=3)
@@ -0,0 +1,110 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import DSS_adapter
+from Deal import hand_to_strings
+from PBNReader import read_deals, read_deal_list, parse_deals, DealStream, pbn_seats, pbn_strains
+
+deals_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dds', 'hands', 'list10.txt')
+
+pbn_vulnerable = {'none': 'None', 'N/S': 'NS', 'E/W': 'EW', 'BOTH': 'All'}
+
+
+# a game in PBN tags, with the OptimumResultTable if with_table
+def pbn_game(board, deal, vulnerable, dealer, table, with_table=True):
+    hands = []
+    for hand in deal:
+        # hand_to_strings gives cards like 'QS' and '10H', PBN wants suits S.H.D.C of ranks like 'QJ6'
+        cards = hand_to_strings(hand)
+        hands.append('.'.join(''.join(card[:-1].replace('10', 'T') for card in cards if card[-1] == suit)
+                              for suit in 'SHDC'))
+    lines = [f'[Board "{board}"]', f'[Dealer "{pbn_seats[dealer]}"]', f'[Vulnerable "{pbn_vulnerable[vulnerable]}"]',
+             f'[Deal "N:{" ".join(hands)}"]']
+    if with_table:
+        lines.append('[OptimumResultTable "Declarer;Denomination\\2R;Result\\2R"]')
+        lines += [f'{seat} {strain} {table[s, h]}' for h, seat in enumerate(pbn_seats) for s, strain in enumerate(pbn_strains)]
+    return lines
+
+
+class TestPBNReader(unittest.TestCase):
+
+    def setUp(self):
+        DSS_adapter.clear_cache()
+        self.records = list(read_deals(deals_path))
+
+    def test_dds_test_file(self):
+        self.assertEqual(len(self.records), 10)
+        for deal, vulnerable, dealer, table, par in self.records:
+            self.assertEqual(sorted(deal.ravel()), list(range(52)))
+            self.assertEqual(DSS_adapter.par_contracts([table], [vulnerable], [dealer])[0], par)
+
+        for record, listed in zip(self.records, read_deal_list(deals_path)):
+            np.testing.assert_array_equal(record[3], listed[3])
+
+    def test_pbn_tags(self):
+        lines = []
+        for board, (deal, vulnerable, dealer, table, par) in enumerate(self.records[:3]):
+            lines += pbn_game(board + 1, deal, vulnerable, dealer, table, with_table=board != 1)
+            # the second game doesn't end with an empty line
+            if board != 1:
+                lines.append('')
+
+        games = list(parse_deals(lines))
+        self.assertEqual(len(games), 3)
+        for (deal, vulnerable, dealer, table, par), expected in zip(games, self.records):
+            np.testing.assert_array_equal(deal, expected[0])
+            self.assertEqual((vulnerable, dealer), expected[1:3])
+            self.assertIsNone(par)
+        np.testing.assert_array_equal(games[0][3], self.records[0][3])
+        self.assertIsNone(games[1][3])
+
+    def test_stream_uses_tables(self):
+        stream = DealStream(deals_path, batch_size=4)
+        records = stream.take(12)
+        stream.close()
+
+        # the file is read again from the start after 10 deals
+        self.assertEqual(stream.stats(), {'records': 12, 'solved': 0, 'passes': 1})
+        np.testing.assert_array_equal(records[10][0], self.records[0][0])
+
+        # nothing is solved for the tables or the par contracts
+        deal, vulnerable, dealer, table = records[0]
+        misses = DSS_adapter.get_cache_stats()['misses']
+        DSS_adapter.return_best_contract(deal, vulnerable, dealer, 'par')
+        DSS_adapter.getFullResults(deal)
+        self.assertEqual(DSS_adapter.get_cache_stats()['misses'], misses)
+
+    def test_stream_resumes_from_state(self):
+        stream = DealStream(deals_path, batch_size=4)
+        stream.take(13)
+        state = stream.get_state()
+        stream.close()
+        self.assertEqual(state, {'passes': 1, 'position': 3})
+
+        stream = DealStream(deals_path, batch_size=4, state=state)
+        records = stream.take(2)
+        stream.close()
+        self.assertEqual(stream.get_state(), {'passes': 1, 'position': 5})
+        for record, expected in zip(records, self.records[3:5]):
+            np.testing.assert_array_equal(record[0], expected[0])
+            self.assertEqual(record[1:3], expected[1:3])
+
+    def test_stream_solves_missing_tables(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.pbn', delete=False) as f:
+            for board, (deal, vulnerable, dealer, table, par) in enumerate(self.records[:3]):
+                f.write('\n'.join(pbn_game(board + 1, deal, vulnerable, dealer, table, with_table=False)) + '\n\n')
+        try:
+            stream = DealStream(f.name)
+            records = stream.take(3)
+            stream.close()
+        finally:
+            os.remove(f.name)
+
+        self.assertEqual(stream.stats()['solved'], 3)
+        for record, expected in zip(records, self.records):
+            np.testing.assert_array_equal(record[3], expected[3])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import contextlib
+import io
+import unittest
+from unittest import mock
+import numpy as np
+import Evaluation
+from Evaluation import RacingEvaluator, draw_deal_pool, play_trials
+from test_helpers import load_config, random_genomes
+
+
+class TestRacing(unittest.TestCase):
+
+    def setUp(self):
+        self.config = load_config()
+        self.genomes = random_genomes(self.config, 6)
+
+    def evaluate(self, **options):
+        evaluator = RacingEvaluator(8, np.random.default_rng(0), batch_size=4, **options)
+        with contextlib.redirect_stdout(io.StringIO()):
+            evaluator.evaluate(self.genomes, self.config)
+        return evaluator
+
+    def expected_fitness(self, deal_pool):
+        fitness = []
+        for (key1, genome1), (key2, genome2) in zip(self.genomes[0::2], self.genomes[1::2]):
+            fitness += play_trials(genome1, genome2, self.config, deal_pool)[:2]
+        return fitness
+
+    def test_decided_pairs_stop(self):
+        # every pair counts as decided after the first batch
+        evaluator = self.evaluate(confidence=0.0)
+        self.assertEqual(evaluator.games, 3 * 4)
+        self.assertEqual(evaluator.deals, 4)
+
+        deal_pool = draw_deal_pool(4, np.random.default_rng(0))
+        self.assertEqual([genome.fitness for key, genome in self.genomes], self.expected_fitness(deal_pool))
+
+    def test_undecided_pairs_play_max_trials(self):
+        # no pair is ever decided, all of them play max_trials deals
+        evaluator = self.evaluate(confidence=np.inf, max_trials=8, budget=100)
+        self.assertEqual(evaluator.games, 3 * 8)
+
+        rng = np.random.default_rng(0)
+        deal_pool = draw_deal_pool(4, rng) + draw_deal_pool(4, rng)
+        self.assertEqual([genome.fitness for key, genome in self.genomes], self.expected_fitness(deal_pool))
+
+    def test_budget(self):
+        evaluator = self.evaluate(confidence=np.inf, max_trials=40, budget=20)
+        self.assertLess(evaluator.games, 20 + 4)
+
+    def test_constant_scores_are_not_certain(self):
+        # the first pair always scores 0.5, the others alternate 10 either side of 0 and 1
+        first = self.genomes[0][1]
+        deals = {}
+
+        def play_scores(genome1, genome2, config, deal_pool, ns_best=None):
+            deals[genome1.key] = deals.get(genome1.key, 0) + len(deal_pool)
+            if genome1 is first:
+                return np.full((len(deal_pool), 2), 0.5)
+            signs = np.resize([10.0, -10.0], len(deal_pool))[:, None]
+            return signs + [0.0, 1.0]
+
+        # the threshold is 1, the first pair is half a point from it, well within 2 pooled standard errors
+        with mock.patch.object(Evaluation, 'play_scores', side_effect=play_scores):
+            self.evaluate(max_trials=8, budget=100)
+        self.assertEqual(deals[first.key], 8)
+
+
+if __name__ == '__main__':
+    unittest.main()
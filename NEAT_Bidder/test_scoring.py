@@ -1,5 +1,6 @@
 import unittest
-from Scoring import get_score_from_result
+import numpy as np
+from Scoring import get_score_from_result, score_contracts, strains, doubles, imps
 
 class TestBridgeScoring(unittest.TestCase):
 
@@ -32,6 +33,38 @@ class TestBridgeScoring(unittest.TestCase):
         self.assertEqual(get_score_from_result('2C', 'XX', 'E', True, 8), 760)
         self.assertEqual(get_score_from_result('3NT', 'N', 'W', False, 8), -50)
 
+
+class TestScoreTable(unittest.TestCase):
+
+    def test_matches_scalar_scoring(self):
+        # every contract, doubled state, vulnerability and result
+        for level in range(1, 8):
+            for s, strain in enumerate(strains):
+                for d, doubled in enumerate(doubles):
+                    for vulnerable in [False, True]:
+                        for making in range(14):
+                            expected = get_score_from_result(str(level) + strain, doubled, 'N', vulnerable, making)
+                            self.assertEqual(score_contracts(level, s, d, vulnerable, making), expected)
+
+    def test_batch(self):
+        levels = np.array([1, 3, 2, 6, 3, 7])
+        strain_indices = np.array([strains.index(strain) for strain in ['NT', 'NT', 'H', 'NT', 'NT', 'D']])
+        doubled_indices = np.array([doubles.index(doubled) for doubled in ['N', 'N', 'X', 'N', 'XX', 'XX']])
+        vulnerable = np.array([False, False, False, False, True, True])
+        making = np.array([9, 9, 8, 12, 2, 13])
+
+        scores = score_contracts(levels, strain_indices, doubled_indices, vulnerable, making)
+        np.testing.assert_array_equal(scores, [150, 400, 470, 990, -4000, 2660])
+
+
+class TestImps(unittest.TestCase):
+
+    def test_imps(self):
+        # overtrick, partscore swing, game swing, slam swing and the maximum
+        differences = [10, -20, 140, -420, 640, 1470, 5000]
+        np.testing.assert_array_equal(imps(differences), [0, -1, 4, -9, 12, 16, 24])
+        self.assertEqual(imps(0), 0)
+
         
 
 
@@ -0,0 +1,54 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+import Timing
+from Timing import TimingReporter, timed
+
+
+@timed('main_stage')
+def main_stage():
+    pass
+
+
+@timed('producer_stage')
+def producer_stage():
+    pass
+
+
+class TestTiming(unittest.TestCase):
+
+    def tearDown(self):
+        Timing.enabled = False
+        Timing.reset()
+
+    def test_reporter_output(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'timing.jsonl')
+            reporter = TimingReporter(path)
+
+            for generation in range(2):
+                reporter.start_generation(generation)
+                main_stage()
+                producer = threading.Thread(target=producer_stage)
+                producer.start()
+                producer.join()
+                reporter.post_evaluate(None, None, None, None)
+                reporter.end_generation(None, None, None)
+
+            with open(path) as f:
+                records = [json.loads(line) for line in f]
+
+        self.assertEqual([record['generation'] for record in records], [0, 1])
+        for record in records:
+            self.assertLessEqual(record['evaluation_seconds'], record['seconds'])
+            # each generation starts counting again, and work on other threads is kept apart
+            self.assertEqual(record['stages']['main_stage']['calls'], 1)
+            self.assertNotIn('producer_stage', record['stages'])
+            self.assertEqual(record['background']['producer_stage']['calls'], 1)
+            self.assertNotIn('main_stage', record['background'])
+
+
+if __name__ == '__main__':
+    unittest.main()